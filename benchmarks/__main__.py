@@ -0,0 +1,137 @@
+""" Runs benchmarks of the matching engine and compares results with a baseline.
+
+    python -m benchmarks -o results.json
+    python -m benchmarks -o new.json --baseline results.json --threshold 0.2
+    python -m benchmarks -k unordered --min-time 0.5
+
+Exits with 1 if some case is slower than in the baseline by more than the threshold.
+"""
+
+from .workloads import WORKLOADS
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import sys
+import time
+
+
+def case_id(name, params):
+    return name + "[" + ",".join(f"{k}={v}" for k, v in params.items()) + "]"
+
+
+def measure(run, repeat, min_time):
+    """ Returns per call times of `repeat` rounds, each long enough to last `min_time`.
+    """
+
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 10 or loops >= 1 << 20:
+            break
+        loops *= 10 if elapsed < min_time / 100 else 2
+    loops = max(1, int(loops * min_time / max(elapsed, 1e-9)))
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        times.append((time.perf_counter() - start) / loops)
+    return loops, times
+
+
+def run_benchmarks(pattern="", repeat=5, min_time=0.2, log=None):
+    results = {}
+    for name, (fn, cases) in WORKLOADS.items():
+        for params in cases:
+            cid = case_id(name, params)
+            if pattern not in cid:
+                continue
+            gen = fn(**params)
+            try:
+                loops, times = measure(next(gen), repeat, min_time)
+            finally:
+                gen.close()
+            results[cid] = {
+                "min": min(times), "median": statistics.median(times),
+                "loops": loops, "repeat": repeat,
+            }
+            if log is not None:
+                log(f"{cid:<60} {min(times) * 1e3:>12.4f} ms")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """ Returns lines of the comparison table and ids of regressed cases.
+    """
+
+    lines = [f"{'case':<60} {'baseline':>12} {'current':>12} {'ratio':>8}"]
+    regressions = []
+    for cid, result in results.items():
+        base = baseline.get(cid)
+        if base is None:
+            lines.append(f"{cid:<60} {'-':>12} {result['min'] * 1e3:>10.4f}ms {'new':>8}")
+            continue
+        ratio = result["min"] / base["min"]
+        mark = ""
+        if ratio > 1 + threshold:
+            regressions.append(cid)
+            mark = "  SLOWER"
+        lines.append(f"{cid:<60} {base['min'] * 1e3:>10.4f}ms {result['min'] * 1e3:>10.4f}ms "
+                     f"{ratio:>8.2f}{mark}")
+    return lines, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="pattern", default="",
+                        help="run only cases which ids contain the substring")
+    parser.add_argument("-o", "--output", help="write results to a JSON file")
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="allowed relative slowdown of the best time (default: 0.1)")
+    parser.add_argument("--repeat", type=int, default=5, help="rounds per case (default: 5)")
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="minimal duration of a round in seconds (default: 0.2)")
+    parser.add_argument("--list", action="store_true", help="list case ids and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, (_, cases) in WORKLOADS.items():
+            for params in cases:
+                print(case_id(name, params))
+        return 0
+
+    results = run_benchmarks(args.pattern, args.repeat, args.min_time, log=print)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "meta": {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "date": datetime.datetime.now().isoformat(timespec="seconds"),
+                },
+                "results": results,
+            }, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        lines, regressions = compare(results, baseline, args.threshold)
+        print()
+        print("\n".join(lines))
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than the baseline by more than "
+                  f"{args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
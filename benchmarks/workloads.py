@@ -0,0 +1,138 @@
+""" Synthetic workloads of the matching engine.
+
+Each workload is a generator taking its parameters as keyword arguments. It prepares the data,
+yields the callable to time and cleans up after it is resumed.
+"""
+
+from majava import matcher, Unordered, Contains, Or, IsInstance, InInterval, EachIs, Any
+from majava.formats import IsJson, decode_cache
+from majava.fs import IsDirectory, DirectoryTree, File
+import json
+import os
+import random
+import tempfile
+
+
+WORKLOADS = {}  # name -> (generator function, list of parameter dicts)
+
+
+def workload(*cases):
+    """ Registers a workload with parameter sets to run it with.
+    """
+
+    def decorator(fn):
+        WORKLOADS[fn.__name__] = (fn, list(cases))
+        return fn
+
+    return decorator
+
+
+def _check(value, m):
+    def run():
+        if not value == m:
+            raise AssertionError(f"{m.explain(value)}")
+
+    return run
+
+
+@workload({"keys": 1_000, "values": "literal"}, {"keys": 1_000, "values": "matcher"},
+          {"keys": 100_000, "values": "literal"}, {"keys": 100_000, "values": "matcher"})
+def dict_wide(keys, values):
+    value = {f"key{i}": i for i in range(keys)}
+    if values == "literal":
+        expected = dict(value)
+    else:
+        expected = {k: IsInstance(int) for k in value}
+    yield _check(value, matcher(expected))
+
+
+@workload({"depth": 10}, {"depth": 100})
+def dict_deep(depth):
+    value = expected = {"leaf": 1, "other": "x"}
+    for i in range(depth):
+        value = {"child": value, "id": i}
+        expected = {"child": expected, "id": IsInstance(int)}
+    yield _check(value, matcher(expected))
+
+
+@workload({"items": 1_000, "kind": "literal"}, {"items": 100_000, "kind": "literal"},
+          {"items": 1_000, "kind": "matcher"})
+def unordered(items, kind):
+    value = list(range(items))
+    random.Random(items).shuffle(value)
+    if kind == "literal":
+        expected = list(range(items))
+    else:
+        expected = [InInterval(i, i) for i in range(items)]
+    yield _check(value, Unordered(expected))
+
+
+@workload({"items": 100_000, "needles": 100})
+def contains_list(items, needles):
+    value = [{"id": i} for i in range(items)]
+    yield _check(value, Contains([{"id": i} for i in range(0, items, items // needles)]))
+
+
+@workload({"size": 1 << 20, "needles": 100})
+def contains_str(size, needles):
+    rnd = random.Random(size)
+    value = "".join(rnd.choice("abcdefgh ") for _ in range(size))
+    step = size // needles
+    yield _check(value, Contains([value[i:i + 16] for i in range(0, size - 16, step)]))
+
+
+@workload({"items": 1_000_000, "needles": 100})
+def contains_ordered(items, needles):
+    value = list(range(items))
+    yield _check(value, Contains(list(range(0, items, items // needles)), ordered=True))
+
+
+@workload({"alternatives": 10, "kind": "literal"}, {"alternatives": 100, "kind": "literal"},
+          {"alternatives": 100, "kind": "dict"})
+def or_chain(alternatives, kind):
+    if kind == "literal":
+        options = [f"option{i}" for i in range(alternatives)]
+    else:
+        options = [{"type": f"t{i}", "value": IsInstance(int)} for i in range(alternatives)]
+    value = "option%d" % (alternatives - 1) if kind == "literal" \
+        else {"type": f"t{alternatives - 1}", "value": 1}
+    yield _check(value, Or(*options))
+
+
+def _json_document(size):
+    rnd = random.Random(size)
+    items = []
+    length = 0
+    while length < size:
+        item = {"id": len(items), "name": f"item-{rnd.random()}", "tags": ["a", "b"],
+                "price": rnd.random() * 100, "meta": {"ok": True, "note": None}}
+        items.append(item)
+        length += 120
+    return json.dumps({"count": len(items), "items": items})
+
+
+@workload({"size": 1 << 20, "stream": False}, {"size": 1 << 20, "stream": True},
+          {"size": 8 << 20, "stream": False}, {"size": 8 << 20, "stream": True})
+def is_json(size, stream):
+    document = _json_document(size)
+    m = IsJson({
+        "count": IsInstance(int),
+        "items": EachIs({"id": IsInstance(int), "name": Any, "tags": Any,
+                         "price": InInterval(0, 100), "meta": Any}),
+    }, stream=stream)
+    check = _check(document, m)
+
+    def run():
+        decode_cache.clear()  # time decoding, not cache hits
+        check()
+
+    yield run
+
+
+@workload({"entries": 1_000}, {"entries": 20_000})
+def directory(entries):
+    with tempfile.TemporaryDirectory() as path:
+        for i in range(entries):
+            with open(os.path.join(path, f"file{i}.txt"), "w") as f:
+                f.write("x")
+        yield _check(path, IsDirectory(is_empty=False) & DirectoryTree({"*.txt": File(size=1)}))
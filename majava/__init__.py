@@ -1,10 +1,17 @@
-from .matchers import Matcher, And, Or, Any, MayBe, Absent, matcher
+from .matchers import Matcher, And, Or, Any, MayBe, Absent, matcher, compile_plan, Memoized, \
+    Shared
 from .basic import IsInstance, DictContains, Round, Contains, Unordered, \
-    StartsWith, EndsWith, LengthIs, InInterval, HasAttrs
+    StartsWith, EndsWith, LengthIs, InInterval, HasAttrs, EachIs, Regexp, FullMatch, Search
+from .snapshot import Snapshot
+from .polling import Eventually
+from .parallel import match_many
+from .dispatch import register_view
 
 
 __all__ = [
-    "Matcher", "And", "Or", "Any", "MayBe", "Absent", "matcher",
+    "Matcher", "And", "Or", "Any", "MayBe", "Absent", "matcher", "compile_plan", "Memoized",
+    "Shared",
     "InInterval", "IsInstance", "DictContains", "Round", "Contains", "Unordered",
-    "StartsWith", "EndsWith", "LengthIs", "HasAttrs"
+    "StartsWith", "EndsWith", "LengthIs", "HasAttrs", "EachIs", "Regexp", "FullMatch", "Search",
+    "Snapshot", "Eventually", "match_many", "register_view",
 ]
@@ -0,0 +1,222 @@
+""" Vectorized matchers for NumPy arrays. Requires `numpy` to be installed.
+"""
+
+from .matchers import Matcher, Mismatch, compile_plan, _consumes
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+REPORT_LIMIT = 5
+_CHUNK_SIZE = 1 << 16
+
+
+def _require_numpy(name):
+    if np is None:
+        raise ImportError(f"{name} requires numpy, install it with `pip install majava[numpy]`")
+
+
+def _as_array(value):
+    try:
+        return np.asarray(value)
+    except (TypeError, ValueError) as e:
+        raise Mismatch(value, "", f"not an array - {e}") from e
+
+
+def _first_indices(bad, limit):
+    """ Returns the total count and first `limit` indices of True items.
+    Scans in chunks, so indices of all items are never materialized.
+    """
+
+    flat = bad.ravel()
+    count = int(np.count_nonzero(flat))
+    found = []
+    for start in range(0, flat.size, _CHUNK_SIZE):
+        if len(found) >= min(count, limit):
+            break
+        nz = np.flatnonzero(flat[start:start + _CHUNK_SIZE])
+        found.extend(int(i) + start for i in nz[:limit - len(found)])
+
+    if bad.ndim != 1:
+        found = [tuple(int(i) for i in np.unravel_index(idx, bad.shape)) for idx in found]
+    return count, found
+
+
+def _report_bad(value, arr, bad, what, limit):
+    count, indices = _first_indices(bad, limit)
+    items_str = ", ".join(f"[{i}]={arr[i]!r}" for i in indices)
+    more = ", ..." if count > len(indices) else ""
+    return Mismatch(value, "", f"{count} of {arr.size} items are {what}: {items_str}{more}")
+
+
+class _ArrayMatcher(Matcher):
+    """ Base for matchers checking all items of an array at once.
+    Subclasses provide `_bad(arr)` returning a mask of mismatching items.
+    """
+
+    _what = "not matching"
+
+    def __init__(self, limit=REPORT_LIMIT):
+        _require_numpy(type(self).__name__)
+        self.limit = limit
+
+    def _check(self, arr):
+        pass
+
+    def _match(self, other):
+        arr = _as_array(other)
+        self._check(arr)
+        try:
+            bad = self._bad(arr)
+        except TypeError as e:
+            raise Mismatch(other, "", f"invalid type - {e}") from e
+        if bad.any():
+            raise _report_bad(other, arr, bad, self._what, self.limit)
+
+    def _matches(self, other):
+        try:
+            arr = np.asarray(other)
+            self._check(arr)
+            return not self._bad(arr).any()
+        except (Mismatch, TypeError, ValueError):
+            return False
+
+
+class ArrayClose(_ArrayMatcher):
+    """ All items are close to expected ones, see `numpy.isclose`.
+    """
+
+    def __init__(self, expected, rtol=1e-05, atol=1e-08, equal_nan=False, limit=REPORT_LIMIT):
+        super().__init__(limit)
+        self.expected = np.asarray(expected)
+        self.rtol = rtol
+        self.atol = atol
+        self.equal_nan = equal_nan
+        self._what = f"not close to expected (rtol={rtol}, atol={atol})"
+
+    def __repr__(self):
+        return f"ArrayClose({self.expected!r}, rtol={self.rtol}, atol={self.atol})"
+
+    def _check(self, arr):
+        if self.expected.ndim and arr.shape != self.expected.shape:
+            raise Mismatch(
+                arr, "", f"invalid shape - got {arr.shape}, expected {self.expected.shape}")
+
+    def _bad(self, arr):
+        return ~np.isclose(arr, self.expected, self.rtol, self.atol, self.equal_nan)
+
+
+class ArrayInInterval(_ArrayMatcher):
+    """ All items are in [low, high].
+    """
+
+    def __init__(self, low, high, limit=REPORT_LIMIT):
+        super().__init__(limit)
+        self.low = low
+        self.high = high
+        self._what = f"not in [{low}, {high}]"
+
+    def __repr__(self):
+        return f"ArrayInInterval({self.low!r}, {self.high!r})"
+
+    def _bad(self, arr):
+        return ~((arr >= self.low) & (arr <= self.high))
+
+
+class ArrayRound(_ArrayMatcher):
+    """ All items rounded to `digits` are equal to the rounded expected value(s).
+    """
+
+    def __init__(self, value, digits=0, limit=REPORT_LIMIT):
+        super().__init__(limit)
+        self.value = np.round(value, digits)
+        self.digits = digits
+        self._what = f"not ~{self.value}"
+
+    def __repr__(self):
+        return f"ArrayRound({self.value!r})"
+
+    def _bad(self, arr):
+        return np.round(arr, self.digits) != self.value
+
+
+class DtypeIs(Matcher):
+    """ Array has the given dtype (or one of its sub-dtypes for generic ones like `np.floating`).
+    """
+
+    def __init__(self, dtype):
+        _require_numpy("DtypeIs")
+        self.dtype = dtype
+
+    def __repr__(self):
+        name = getattr(self.dtype, "__name__", self.dtype)
+        return f"DtypeIs({name})"
+
+    def _matches(self, other):
+        dtype = getattr(other, "dtype", None)
+        return dtype is not None and np.issubdtype(dtype, self.dtype)
+
+    def _match(self, other):
+        if not self._matches(other):
+            raise Mismatch(other, "", f"invalid dtype - got {getattr(other, 'dtype', None)}, "
+                                      f"expected {self!r}")
+
+
+class ShapeIs(Matcher):
+    """ Array has the given shape, None matches any size of a dimension.
+    """
+
+    def __init__(self, *shape):
+        _require_numpy("ShapeIs")
+        self.shape = shape
+
+    def __repr__(self):
+        return f"ShapeIs{self.shape!r}"
+
+    def _matches(self, other):
+        shape = getattr(other, "shape", None)
+        return shape is not None and len(shape) == len(self.shape) and all(
+            e is None or e == s for e, s in zip(self.shape, shape))
+
+    def _match(self, other):
+        if not self._matches(other):
+            raise Mismatch(other, "", f"invalid shape - got {getattr(other, 'shape', None)}, "
+                                      f"expected {self.shape}")
+
+
+class Columns(Matcher):
+    """ Fields of a record/structured array match the given matchers,
+    e.g. `Columns(ts=DtypeIs(np.int64), value=ArrayInInterval(0, 1))`.
+    """
+
+    def __init__(self, **columns):
+        _require_numpy("Columns")
+        self.columns = columns
+        self._plans = {k: compile_plan(v) for k, v in columns.items()}
+        self._explain_first = _consumes(self._plans.values())
+
+    def __repr__(self):
+        columns_str = ", ".join(f"{k}={v!r}" for k, v in self.columns.items())
+        return f"Columns({columns_str})"
+
+    def _names(self, other):
+        dtype = getattr(other, "dtype", None)
+        return (dtype.names or ()) if dtype is not None else ()
+
+    def _match(self, other):
+        names = self._names(other)
+        missing = [k for k in self._plans if k not in names]
+        if missing:
+            raise Mismatch.missing_keys(other, missing)
+
+        for name, plan in self._plans.items():
+            try:
+                plan._match(other[name])
+            except Mismatch as e:
+                raise e.prepend(name)
+
+    def _matches(self, other):
+        names = self._names(other)
+        return all(k in names and plan._matches(other[k]) for k, plan in self._plans.items())
@@ -1,4 +1,8 @@
-from majava.matchers import Matcher, Mismatch, _match_dict, make_matcher, _match, Absent
+from majava.matchers import Matcher, Mismatch, make_matcher, _DictPlan, Absent, compile_plan, \
+    _is_literal, _consumes, _dict_dispatch, _viewed, _HASHABLE_LITERALS, _NO_TAG
+from majava.report import short_repr
+import functools
+import re
 
 
 class DictContains(Matcher):
@@ -8,12 +12,21 @@ class DictContains(Matcher):
     def __init__(self, expected, *, recursive=True):
         self.expected = expected
         self.recursive = recursive
+        self._plan = self._dict_plan = _DictPlan(expected, allow_unexpected=True)
+        self._explain_first = self._plan._explain_first
+        self._height = self._plan._height
 
     def __repr__(self):
-        return f"DictContains({repr(self.expected)})"
+        return f"DictContains({short_repr(self.expected)})"
+
+    def _steps(self, other):
+        return self._plan._steps(other)
 
     def _match(self, other):
-        _match_dict(self.expected, other, allow_unexpected=True)
+        self._plan._match(other)
+
+    def _matches(self, other):
+        return self._plan._matches(other)
 
 
 class IsInstance(Matcher):
@@ -30,6 +43,9 @@ class IsInstance(Matcher):
         if not isinstance(other, self.types):
             raise Mismatch(other, "", f"not {self}")
 
+    def _matches(self, other):
+        return isinstance(other, self.types)
+
 
 class Round(Matcher):
     def __init__(self, value, digits=0):
@@ -40,42 +56,317 @@ class Round(Matcher):
         return f"Round({self.value})"
 
     def _match(self, other):
-        if self.value != round(other, self.digits):
+        if not self._matches(other):
             raise Mismatch(other, "", f"not ~{self.value}")
 
+    def _matches(self, other):
+        return self.value == round(other, self.digits)
+
 
 class ContainsOrdered(Matcher):
+    """ Value must contain expected items in the given order, other items may be between.
+    Works in a single pass over any iterable, strings are searched for substrings.
+    """
+
     def __init__(self, items):
         self.items = items
+        self._items = list(items)
+        self._plans = [compile_plan(it) for it in self._items]
+        self._explain_first = _consumes(self._plans)
 
     def __repr__(self):
-        return f"ContainsOrdered({self.items})"
+        return f"ContainsOrdered({short_repr(self.items)})"
 
     def _match(self, other):
-        idx = 0
-        for it in self.items:
-            try:
-                idx = other[idx:].index(it) + 1
-            except ValueError:
-                raise Mismatch(other, "", f"{repr(it)} is not in order")
+        found, prev_idx = self._scan(other)
+        if found < len(self._items):
+            it = self._items[found]
+            if prev_idx is None:
+                raise Mismatch(other, "", f"{repr(it)} is not found")
+            raise Mismatch(
+                other, "", f"{repr(it)} is not in order - not found after index {prev_idx}")
+
+    def _matches(self, other):
+        return self._scan(other)[0] == len(self._items)
+
+    def _scan(self, other):
+        """ Returns the number of items found in order and the index of the last one.
+        """
+
+        if isinstance(other, (str, bytes, bytearray)):
+            return self._scan_str(other)
+
+        plans = self._plans
+        found, prev_idx = 0, None
+        if not plans:
+            return found, prev_idx
+
+        for idx, value in enumerate(other):
+            if plans[found]._matches(value):
+                found, prev_idx = found + 1, idx
+                if found == len(plans):
+                    break
+        return found, prev_idx
+
+    def _scan_str(self, other):
+        pos, prev_idx = 0, None
+        for found, it in enumerate(self._items):
+            idx = other.find(it, pos)
+            if idx == -1:
+                return found, prev_idx
+            pos, prev_idx = idx + len(it), idx
+        return len(self._items), prev_idx
+
+
+_FROZEN_DICT = object()
+_FROZEN_LIST = object()
+_FROZEN_TUPLE = object()
+
+
+def _freeze(value):
+    """ Makes a hashable key equal for values equal by `==`.
+    Raises TypeError for values that cannot be frozen.
+    """
+
+    t = type(value)
+    if t is dict:
+        return _FROZEN_DICT, frozenset((k, _freeze(v)) for k, v in value.items())
+    if t is list:
+        return _FROZEN_LIST, tuple(_freeze(v) for v in value)
+    if t is tuple:
+        return _FROZEN_TUPLE, tuple(_freeze(v) for v in value)
+    hash(value)
+    return value
+
+
+def _max_bipartite_matching(adj, right_count):
+    """ Hopcroft-Karp algorithm.
+    Returns a list with a matched right vertex (or -1) for each left vertex.
+    """
+
+    match_l = [-1] * len(adj)
+    match_r = [-1] * right_count
+
+    for u, vs in enumerate(adj):
+        for v in vs:
+            if match_r[v] == -1:
+                match_l[u], match_r[v] = v, u
+                break
+
+    while True:
+        dist = [-1] * len(adj)
+        queue = [u for u, v in enumerate(match_l) if v == -1 and adj[u]]
+        for u in queue:
+            dist[u] = 0
+
+        found = False
+        for u in queue:
+            for v in adj[u]:
+                w = match_r[v]
+                if w == -1:
+                    found = True
+                elif dist[w] == -1:
+                    dist[w] = dist[u] + 1
+                    queue.append(w)
+        if not found:
+            return match_l
+
+        pos = [0] * len(adj)
+        for root in range(len(adj)):
+            if match_l[root] != -1 or dist[root] != 0:
+                continue
+            stack = [root]
+            while stack:
+                u = stack[-1]
+                vs = adj[u]
+                while pos[u] < len(vs):
+                    v = vs[pos[u]]
+                    pos[u] += 1
+                    w = match_r[v]
+                    if w == -1:
+                        for x in stack:  # augment along the path
+                            y = adj[x][pos[x] - 1]
+                            match_l[x], match_r[y] = y, x
+                        stack = None
+                        break
+                    if dist[w] == dist[u] + 1:
+                        stack.append(w)
+                        break
+                else:
+                    dist[u] = -1  # dead end
+                    stack.pop()
+                    continue
+                if stack is None:
+                    break
+
+
+_NO_KEY = object()
+
+
+def _item_key(item):
+    if not _is_literal(item):
+        return _NO_KEY
+    try:
+        return _freeze(item)
+    except TypeError:
+        return _NO_KEY
+
+
+def _match_items(keys, plans, values, dispatch=None):
+    """ Finds a one-to-one matching between expected items and values.
+    Returns indices of unmatched items and unmatched values.
+
+    Freezable literals are paired through hash buckets in linear time,
+    the rest goes through maximum bipartite matching. Dict items with literals at
+    the `dispatch` key (see `_dict_dispatch`) are tried only on values having them.
+    """
+
+    buckets = {}
+    unkeyed = []
+    for idx, value in enumerate(values):
+        try:
+            buckets.setdefault(_freeze(value), []).append(idx)
+        except TypeError:
+            unkeyed.append(idx)
+
+    left = {k: list(v) for k, v in buckets.items()}
+    paired = False
+    complex_items = []
+    for idx, key in enumerate(keys):
+        if key is not _NO_KEY:
+            bucket = left.get(key)
+            if bucket:
+                bucket.pop()
+                paired = True
+                continue
+        complex_items.append(idx)
+
+    rest = sorted(unkeyed + [i for bucket in left.values() for i in bucket])
+    if not complex_items:
+        return [], rest
+
+    candidates = {}
+    missing, unexpected = _match_bipartite(
+        plans, complex_items, values, rest, candidates, dispatch)
+    if not paired or all(keys[i] is not _NO_KEY for i in missing):
+        return missing, unexpected
+
+    # Hash pairing is greedy, a matcher may need a value taken by an equal literal.
+    # Matchers are additionally tried on the consumed values only, literals keep
+    # their buckets as candidates.
+    rest_set = set(rest)
+    consumed = [i for i in range(len(values)) if i not in rest_set]
+    index = None if dispatch is None else _ItemIndex(dispatch, values, consumed)
+    extra = {}
+    adj = []
+    for idx, plan in enumerate(plans):
+        edges = candidates.get(id(plan), [])
+        if keys[idx] is not _NO_KEY:
+            edges = list(dict.fromkeys(buckets.get(keys[idx], []) + edges))
+        else:
+            more = extra.get(id(plan))
+            if more is None:
+                pool = consumed if index is None else index.candidates(plan, consumed)
+                more = [i for i in pool if _probe(plan, values[i])]
+                extra[id(plan)] = more
+            edges = edges + more
+        adj.append(edges)
+
+    full_missing, full_unexpected = _unmatched(adj, range(len(plans)), range(len(values)))
+    if len(full_missing) < len(missing):
+        return full_missing, full_unexpected
+    return missing, unexpected
+
+
+def _match_bipartite(plans, plan_indices, values, value_indices, candidates, dispatch):
+    index = None if dispatch is None else _ItemIndex(dispatch, values, value_indices)
+    adj = []
+    for idx in plan_indices:
+        plan = plans[idx]
+        edges = candidates.get(id(plan))
+        if edges is None:  # the same matcher object is evaluated only once per value
+            pool = value_indices if index is None else index.candidates(plan, value_indices)
+            edges = [i for i in pool if _probe(plan, values[i])]
+            candidates[id(plan)] = edges
+        adj.append(edges)
+    return _unmatched(adj, plan_indices, value_indices)
+
+
+def _probe(plan, value):
+    """ If the item matches the value, errors of matchers not expecting such values
+    (e.g. `InInterval` of a str) mean it doesn't.
+    """
+
+    try:
+        return plan._matches(value)
+    except (TypeError, ValueError):
+        return False
+
+
+class _ItemIndex:
+    """ Indices of dict values grouped by their value at the dispatch key, so a dict item
+    with a literal there is tried only on values having the same one.
+    """
+
+    def __init__(self, dispatch, values, indices):
+        key, tagged, _ = dispatch
+        self._tags = {id(plan): tag for tag, plans in tagged.items() for plan in plans}
+        self._by_tag = {}
+        self._untagged = []  # values with unhashable values at the key may equal any literal
+        for idx in indices:
+            value = _viewed(values[idx], dict)
+            tag = _NO_TAG if value is None else value.get(key, _NO_TAG)
+            if tag is _NO_TAG:
+                continue  # the key is required by all indexed items
+            if type(tag) in _HASHABLE_LITERALS:
+                self._by_tag.setdefault(tag, []).append(idx)
+            else:
+                self._untagged.append(idx)
+
+    def candidates(self, plan, indices):
+        tag = self._tags.get(id(plan), _NO_TAG)
+        if tag is _NO_TAG:
+            return indices
+        found = self._by_tag.get(tag, [])
+        return sorted(found + self._untagged) if self._untagged else found
+
+
+def _unmatched(adj, left_indices, right_indices):
+    match_l = _max_bipartite_matching(adj, max(right_indices, default=-1) + 1)
+    matched = set(match_l)
+    missing = [i for i, v in zip(left_indices, match_l) if v == -1]
+    unexpected = [i for i in right_indices if i not in matched]
+    return missing, unexpected
 
 
 class _Contains(Matcher):
     def __init__(self, items, ordered=False):
         self.items = items
         self.ordered = ordered
+        self._items = list(items)
+        self._plans = [compile_plan(it) for it in self._items]
+        self._explain_first = _consumes(self._plans)
+        self._keys = [_item_key(it) for it in self._items]
+        self._dispatch = _dict_dispatch(
+            [p for p, key in zip(self._plans, self._keys) if key is _NO_KEY])
 
     def __repr__(self):
-        return f"Contains({self.items})"
+        return f"Contains({short_repr(self.items)})"
 
     def _match(self, other):
-        missing_items = []
-        for it in self.items:
-            if it not in other:
-                missing_items.append(it)
+        missing = self._missing(other)
+        if missing:
+            raise Mismatch.missing_items(other, missing)
+
+    def _matches(self, other):
+        return not self._missing(other)
 
-        if missing_items:
-            raise Mismatch.missing_items(other, missing_items)
+    def _missing(self, other):
+        if isinstance(other, (str, bytes, bytearray)):
+            return [it for it in self._items if it not in other]
+
+        missing, _ = _match_items(self._keys, self._plans, list(other), self._dispatch)
+        return [self._items[i] for i in missing]
 
 
 class Unordered(_Contains):
@@ -83,12 +374,23 @@ class Unordered(_Contains):
     """
 
     def __repr__(self):
-        return f"Unordered({self.items})"
+        return f"Unordered({short_repr(self.items)})"
 
     def _match(self, other):
-        if len(self.items) != len(other):
-            raise Mismatch(other, "", f"len is not {len(self.items)}")
-        super()._match(other)
+        if len(self._items) != len(other):
+            raise Mismatch(other, "", f"len is not {len(self._items)}")
+
+        values = list(other)
+        missing, unexpected = _match_items(self._keys, self._plans, values, self._dispatch)
+        if missing or unexpected:
+            raise Mismatch.unmatched_items(
+                other, [self._items[i] for i in missing], [values[i] for i in unexpected])
+
+    def _matches(self, other):
+        if len(self._items) != len(other):
+            return False
+        missing, unexpected = _match_items(self._keys, self._plans, list(other), self._dispatch)
+        return not (missing or unexpected)
 
 
 def Contains(items, ordered=False):
@@ -107,9 +409,89 @@ def EndsWith(value, expected):
     return value.endswith(expected)
 
 
-@make_matcher
-def LengthIs(value, expected):
-    return len(value) == expected
+class LengthIs(Matcher):
+    """ Value has the expected length.
+    Values without `len()` are counted item by item, stopping as soon as there are too many.
+    """
+
+    def __init__(self, expected):
+        self.expected = expected
+
+    def __repr__(self):
+        return f"LengthIs({self.expected!r})"
+
+    def _count(self, other):
+        """ Returns the length or (expected + 1) if there are more items.
+        """
+
+        try:
+            return len(other)
+        except TypeError:
+            pass
+
+        count = 0
+        for _ in other:
+            count += 1
+            if count > self.expected:
+                break
+        return count
+
+    def _match(self, other):
+        try:
+            count = self._count(other)
+        except TypeError as e:
+            raise Mismatch(other, "", f"not {self} (invalid type - {e})") from e
+        if count == self.expected:
+            return
+        if hasattr(other, "__len__"):
+            raise Mismatch(other, "", f"not {self}")
+        if count > self.expected:
+            raise Mismatch(other, "", f"not {self} - got more than {self.expected} items")
+        raise Mismatch(other, "", f"not {self} - got {count} items")
+
+    def _matches(self, other):
+        try:
+            return self._count(other) == self.expected
+        except TypeError:
+            return False
+
+
+class EachIs(Matcher):
+    """ Each item of value matches the expected one.
+    Items are consumed one at a time, so any iterable may be checked in constant memory.
+    """
+
+    def __init__(self, expected):
+        self.expected = expected
+        self._plan = compile_plan(expected)
+        self._explain_first = self._plan._explain_first
+
+    def __repr__(self):
+        return f"EachIs({short_repr(self.expected)})"
+
+    def _match(self, other):
+        try:
+            items = iter(other)
+        except TypeError as e:
+            raise Mismatch(other, "", f"not iterable - {e}") from e
+
+        plan = self._plan
+        for idx, item in enumerate(items):
+            if not plan._explain_first and plan._matches(item):
+                continue
+            try:
+                plan._match(item)
+            except Mismatch as e:
+                raise e.prepend(str(idx))
+            raise Mismatch(item, str(idx), f"not {self.expected!r}")
+
+    def _matches(self, other):
+        try:
+            items = iter(other)
+        except TypeError:
+            return False
+        plan = self._plan
+        return all(plan._matches(item) for item in items)
 
 
 @make_matcher
@@ -117,11 +499,129 @@ def InInterval(value, low, high):
     return low <= value <= high
 
 
-@make_matcher
-def HasAttrs(value, **kwargs):
-    for key, expected in kwargs.items():
+@functools.lru_cache(maxsize=512)
+def _compile_regex(pattern, flags):
+    """ Process-wide bounded cache of compiled patterns.
+    """
+
+    return re.compile(pattern, flags)
+
+
+class Regexp(Matcher):
+    """ Value (str, bytes or memoryview) matches the pattern at its beginning, like `re.match`.
+    Named groups may be checked by nested matchers. Groups are strings (or bytes),
+    `convert` is applied to them first, e.g. for number checks:
+
+        Regexp(r"(?P<n>\\d+)", convert=int, n=InInterval(1, 10))
+
+    Errors of group matchers and of `convert` are reported as mismatches of the group.
+    """
+
+    _method = "match"
+
+    def __init__(self, pattern, *, flags=0, convert=None, **groups):
+        self.pattern = pattern
+        self.flags = flags
+        self.convert = convert
+        self.groups = groups
+        self._regex = _compile_regex(pattern, flags)
+        self._other_regex = None  # for values of the other str/bytes type
+        for name in groups:
+            if name not in self._regex.groupindex:
+                raise ValueError(f"pattern {pattern!r} has no group named {name!r}")
+        self._group_plans = {k: compile_plan(v) for k, v in groups.items()}
+        self._explain_first = _consumes(self._group_plans.values())
+
+    def __repr__(self):
+        groups_str = "".join(f", {k}={v!r}" for k, v in self.groups.items())
+        return f"{type(self).__name__}({self.pattern!r}{groups_str})"
+
+    def _regex_for(self, other):
+        if isinstance(other, str) == isinstance(self.pattern, str):
+            return self._regex
+        if self._other_regex is None:
+            pattern = self.pattern
+            pattern = pattern.decode() if isinstance(pattern, bytes) else pattern.encode()
+            self._other_regex = _compile_regex(pattern, self.flags)
+        return self._other_regex
+
+    def _search(self, other):
+        """ Returns the match object or None, raises TypeError for unsupported values.
+        """
+
+        if not isinstance(other, (str, bytes, bytearray, memoryview)):
+            raise TypeError(f"expected str, bytes or memoryview, not {type(other).__name__}")
+        return getattr(self._regex_for(other), self._method)(other)
+
+    def _group(self, m, name):
+        value = m.group(name)
+        if self.convert is not None and value is not None:
+            try:
+                value = self.convert(value)
+            except (TypeError, ValueError) as e:
+                raise Mismatch(value, name, f"can't convert ({e})") from e
+        return value
+
+    def _check_group(self, name, plan, value):
         try:
-            _match(expected, getattr(value, key, Absent))
+            plan._match(value)
+        except (TypeError, ValueError) as e:
+            hint = "" if self.convert is not None else \
+                f" - the group is {type(value).__name__}, use `convert` to check it as a number"
+            raise Mismatch(value, name, f"not {short_repr(plan)} ({e}){hint}") from e
         except Mismatch as e:
-            raise e.prepend(key)
-    return True
+            raise e.prepend(name)
+
+    def _match(self, other):
+        try:
+            m = self._search(other)
+        except TypeError as e:
+            raise Mismatch(other, "", f"not {self} (invalid type - {e})") from e
+        if m is None:
+            raise Mismatch(other, "", f"not {self}")
+
+        for name, plan in self._group_plans.items():
+            self._check_group(name, plan, self._group(m, name))
+
+    def _matches(self, other):
+        try:
+            m = self._search(other)
+            return m is not None and all(
+                plan._matches(self._group(m, name)) for name, plan in self._group_plans.items())
+        except (TypeError, ValueError, Mismatch):
+            return False
+
+
+class FullMatch(Regexp):
+    """ Whole value matches the pattern, like `re.fullmatch`.
+    """
+
+    _method = "fullmatch"
+
+
+class Search(Regexp):
+    """ Pattern matches anywhere in the value, like `re.search`.
+    """
+
+    _method = "search"
+
+
+class HasAttrs(Matcher):
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self._plans = {k: compile_plan(v) for k, v in kwargs.items()}
+        self._explain_first = _consumes(self._plans.values())
+
+    def __repr__(self):
+        kwargs_str = ", ".join(f"{k}={short_repr(v)}" for k, v in self.kwargs.items())
+        return f"HasAttrs({kwargs_str})"
+
+    def _match(self, other):
+        for key, plan in self._plans.items():
+            try:
+                plan._match(getattr(other, key, Absent))
+            except Mismatch as e:
+                raise e.prepend(key)
+
+    def _matches(self, other):
+        return all(plan._matches(getattr(other, key, Absent)) for key, plan in self._plans.items())
@@ -0,0 +1,116 @@
+""" Handlers by value type, resolved along the MRO like with `functools.singledispatch`
+and cached per type, so the lookup cost doesn't depend on the number of handlers.
+
+`views` converts values of other types for dict and list expectations. Dataclasses,
+namedtuples, attrs classes and Pydantic models are viewed as dicts of their fields,
+other types are registered with `register_view`, e.g. to compare any mapping or sequence:
+
+    register_view(Mapping, dict)
+    register_view(Sequence, list)
+
+    @register_view(Money)
+    def _(value):
+        return {"amount": value.amount, "currency": value.currency.code}
+"""
+
+from functools import partial
+import abc
+import dataclasses
+
+
+class TypeRegistry:
+    """ Handlers of classes, their subclasses and virtual subclasses of registered ABCs.
+    Kinds of classes without a common base (e.g. dataclasses) are registered with a predicate
+    and a factory making the handler of a class, which is called once per class.
+    """
+
+    def __init__(self):
+        self._types = {}  # class -> handler
+        self._kinds = []  # (predicate, factory), the latest first
+        self._cache = {}  # class -> handler or None
+        self._token = None  # token of ABC registrations the cache is valid for
+
+    def register(self, cls, handler=None):
+        """ Registers the handler of the class, may be used as a decorator.
+        """
+
+        if handler is None:
+            return partial(self.register, cls)
+        self._types[cls] = handler
+        self._cache.clear()
+        return handler
+
+    def register_kind(self, predicate, factory):
+        """ Registers handlers `factory(cls)` of classes accepted by `predicate(cls)`.
+        """
+
+        self._kinds.insert(0, (predicate, factory))
+        self._cache.clear()
+
+    def dispatch(self, cls):
+        """ Returns the handler of the class or None.
+        """
+
+        token = abc.get_cache_token()
+        if token != self._token:
+            self._cache.clear()
+            self._token = token
+        try:
+            return self._cache[cls]
+        except KeyError:
+            handler = self._cache[cls] = self._find(cls)
+            return handler
+
+    def _find(self, cls):
+        types = self._types
+        for base in cls.__mro__:
+            if base in types:
+                return types[base]
+        for predicate, factory in self._kinds:
+            if predicate(cls):
+                return factory(cls)
+        # virtual subclasses, the latest registration first
+        for base, handler in reversed(types.items()):
+            if isinstance(base, abc.ABCMeta) and issubclass(cls, base):
+                return handler
+        return None
+
+
+class FieldsView:
+    """ View of an object as the dict of its fields, which are listed once per class.
+    """
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+
+    def __repr__(self):
+        return f"FieldsView({self.fields})"
+
+    def __call__(self, value):
+        return {name: getattr(value, name) for name in self.fields}
+
+
+def _is_namedtuple(cls):
+    return issubclass(cls, tuple) and isinstance(getattr(cls, "_fields", None), tuple)
+
+
+def _pydantic_fields(cls):
+    fields = getattr(cls, "model_fields", None)  # Pydantic 2
+    if isinstance(fields, dict):
+        return fields
+    fields = getattr(cls, "__fields__", None)  # Pydantic 1
+    if isinstance(fields, dict) and hasattr(cls, "__config__"):
+        return fields
+    return None
+
+
+views = TypeRegistry()
+register_view = views.register
+
+views.register_kind(dataclasses.is_dataclass,
+                    lambda cls: FieldsView(f.name for f in dataclasses.fields(cls)))
+views.register_kind(_is_namedtuple, lambda cls: FieldsView(cls._fields))
+views.register_kind(lambda cls: hasattr(cls, "__attrs_attrs__"),
+                    lambda cls: FieldsView(a.name for a in cls.__attrs_attrs__))
+views.register_kind(lambda cls: _pydantic_fields(cls) is not None,
+                    lambda cls: FieldsView(_pydantic_fields(cls)))
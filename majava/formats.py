@@ -1,23 +1,521 @@
-from .matchers import Matcher, Mismatch, _match, Any
+from .matchers import Matcher, Mismatch, Any, compile_plan, _DictPlan, _Literal, _MatcherWrap, \
+    MayBe, _SeqPlan
+from .basic import DictContains, EachIs
+from .report import short_repr
+from collections import OrderedDict
+from json.decoder import scanstring
+from json.scanner import NUMBER_RE
+import codecs
 import json
+import os
+import re
+import threading
+
+
+class DecodeCache:
+    """ Bounded LRU cache of decoded documents shared by format matchers,
+    so e.g. `Or(IsJson(v1), IsJson(v2))` decodes a payload once.
+
+    Only immutable inputs (str, bytes) are cached, the key is the input itself,
+    which costs a hash (cached by str/bytes) and usually an identity check on hit.
+    """
+
+    def __init__(self, max_bytes=64 << 20, max_items=1024):
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def size(self):
+        """ Total length of cached inputs.
+        """
+
+        return self._size
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+            self.hits = self.misses = 0
+
+    def decode(self, kind, data, decode):
+        """ Returns `decode(data)`, raises the same exception as it did.
+        """
+
+        if type(data) not in (str, bytes) or len(data) > self.max_bytes:
+            return decode(data)
+
+        key = (kind, type(data), data)
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if entry is None:
+            try:
+                entry = (True, decode(data))
+            except ValueError as e:
+                entry = (False, e)
+            self._put(key, entry, len(data))
+
+        ok, result = entry
+        if not ok:
+            raise result.with_traceback(None)
+        return result
+
+    def _put(self, key, entry, size):
+        with self._lock:
+            if key in self._items:
+                return
+            self._items[key] = entry
+            self._size += size
+            while self._size > self.max_bytes or len(self._items) > self.max_items:
+                (_, _, data), _ = self._items.popitem(last=False)
+                self._size -= len(data)
+
+
+decode_cache = DecodeCache()
 
 
 class IsJson(Matcher):
-    def __init__(self, expected=Any):
+    """ Value is a JSON document matching the expected value.
+
+    With `stream=True` the document is tokenized incrementally alongside the expectation:
+    `Any` subtrees are skipped without building objects and matching stops at the first
+    mismatch. Skipped subtrees are only scanned for their end, not validated.
+    Streaming also accepts file objects and paths (`os.PathLike`).
+    """
+
+    def __init__(self, expected=Any, *, stream=False):
         self.expected = expected
+        self.stream = stream
+        self._plan = compile_plan(expected)
+        self._explain_first = self._plan._explain_first
 
     def __repr__(self):
-        return f"IsJson({repr(self.expected)})"
+        return f"IsJson({short_repr(self.expected)})"
 
     def _match(self, other):
+        if self.stream:
+            return self._match_stream(other)
+
         try:
-            other_obj = json.loads(other)
+            other_obj = decode_cache.decode("json", other, _loads)
         except TypeError as e:
             raise Mismatch(other, "FromJSON", f"invalid type - {e}")
-        except json.JSONDecodeError as e:
+        except (json.JSONDecodeError, _JsonError) as e:
             raise Mismatch(other, "FromJSON", f"invalid JSON - {e}")
 
         try:
-            _match(self.expected, other_obj)
+            self._plan._match(other_obj)
         except Mismatch as e:
             raise e.prepend("FromJSON")
+
+    def _matches(self, other):
+        if self.stream:
+            return super()._matches(other)
+
+        try:
+            other_obj = decode_cache.decode("json", other, _loads)
+        except (TypeError, json.JSONDecodeError, _JsonError):
+            return False
+        return self._plan._matches(other_obj)
+
+    def _match_stream(self, other):
+        try:
+            reader, close = _open_stream(other)
+        except TypeError as e:
+            raise Mismatch(other, "FromJSON", f"invalid type - {e}")
+
+        try:
+            _stream_match(reader, self._plan)
+            reader.expect_end()
+        except _JsonError as e:
+            raise Mismatch(other, "FromJSON", f"invalid JSON - {e}")
+        except Mismatch as e:
+            raise e.prepend("FromJSON")
+        finally:
+            if close is not None:
+                close()
+
+
+class _JsonError(ValueError):
+    pass
+
+
+def _loads(data):
+    """ `json.loads` falling back to the iterative reader for documents nested too deeply
+    for it, the json module decodes containers recursively.
+    """
+
+    try:
+        return json.loads(data)
+    except RecursionError:
+        reader, _ = _open_stream(data)
+        value = reader.build_value()
+        reader.expect_end()
+        return value
+
+
+class _Skipped:
+    def __repr__(self):
+        return "..."
+
+
+_SKIPPED = _Skipped()
+_SKIPPED_LIST = [_SKIPPED]
+_DECODER = json.JSONDecoder()
+_END = object()
+_WS = re.compile(r"[ \t\n\r]*")
+_STRING_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+# runs of complete strings and anything but brackets
+_PLAIN = re.compile(r'(?:[^"{}\[\]]+|"[^"\\]*(?:\\.[^"\\]*)*")*', re.S)
+_CONSTANTS = {
+    "true": True, "false": False, "null": None,
+    "NaN": float("nan"), "Infinity": float("inf"), "-Infinity": float("-inf"),
+}
+
+
+def _open_stream(value):
+    """ Returns a reader for the value and a callable closing it, if it was opened here.
+    """
+
+    if isinstance(value, str):
+        return _JsonReader(value), None
+    if isinstance(value, (bytes, bytearray)):
+        return _JsonReader(bytes(value).decode(json.detect_encoding(value))), None
+    if isinstance(value, os.PathLike):
+        f = open(value, "rb")
+        return _JsonReader(read=_text_reader(f)), f.close
+    if hasattr(value, "read"):
+        return _JsonReader(read=_text_reader(value)), None
+    raise TypeError(f"expected str, bytes, file or path, not {type(value).__name__}")
+
+
+def _text_reader(f):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+
+    def read(size):
+        while True:
+            chunk = f.read(size)
+            if isinstance(chunk, str):
+                return chunk
+            text = decoder.decode(chunk, final=not chunk)
+            if text or not chunk:
+                return text
+
+    return read
+
+
+class _JsonReader:
+    """ Pull tokenizer over a JSON text that is read in chunks.
+    Only the unconsumed tail of the input is kept in memory.
+    """
+
+    chunk_size = 1 << 16
+
+    def __init__(self, text="", read=None):
+        self.buf = text
+        self.pos = 0
+        self.offset = 0  # position of buf[0] in the document
+        self._read = read
+        self._pin = None  # start of a value being scanned, kept in the buffer
+
+    def _more(self):
+        """ Appends the next chunk to the buffer, returns False at the end of input.
+        """
+
+        if self._read is None:
+            return False
+        # grow chunks with the pending tail, so long tokens are rescanned O(log n) times
+        keep = self.pos if self._pin is None else self._pin
+        chunk = self._read(max(self.chunk_size, len(self.buf) - keep))
+        if not chunk:
+            self._read = None
+            return False
+        self.offset += keep
+        self.buf = self.buf[keep:] + chunk
+        self.pos -= keep
+        if self._pin is not None:
+            self._pin = 0
+        return True
+
+    def error(self, msg):
+        return _JsonError(f"{msg} at char {self.offset + self.pos}")
+
+    def peek(self):
+        """ Skips whitespaces and returns the next char or "" at the end of input.
+        """
+
+        while True:
+            self.pos = _WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._more():
+                return ""
+
+    def expect(self, ch):
+        if self.peek() != ch:
+            raise self.error(f"Expecting {ch!r} delimiter")
+        self.pos += 1
+
+    def expect_end(self):
+        if self.peek():
+            raise self.error("Extra data")
+
+    def _ensure(self, size):
+        while len(self.buf) - self.pos < size and self._more():
+            pass
+
+    def _string_end(self):
+        """ Returns the end of a string started at pos (after the opening quote).
+        """
+
+        while True:
+            m = _STRING_BODY.match(self.buf, self.pos)
+            if m is not None:
+                return m.end()
+            if not self._more():
+                raise self.error("Unterminated string starting")
+
+    def read_string(self):
+        self._string_end()
+        try:
+            s, self.pos = scanstring(self.buf, self.pos)
+        except json.JSONDecodeError as e:
+            raise self.error(e.msg) from None
+        return s
+
+    def read_scalar(self):
+        self._ensure(len("-Infinity"))
+        for text, value in _CONSTANTS.items():
+            if self.buf.startswith(text, self.pos):
+                self.pos += len(text)
+                return value
+
+        while True:
+            m = NUMBER_RE.match(self.buf, self.pos)
+            if m is None or m.end() < len(self.buf) or not self._more():
+                break
+        if m is None:
+            raise self.error("Expecting value")
+        integer, frac, exp = m.groups()
+        self.pos = m.end()
+        if frac or exp:
+            return float(integer + (frac or "") + (exp or ""))
+        return int(integer)
+
+    def iter_object(self):
+        """ Yields keys of an object, the caller must consume the value after each key.
+        """
+
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise self.error("Expecting property name enclosed in double quotes")
+            self.pos += 1
+            key = self.read_string()
+            self.expect(":")
+            yield key
+            ch = self.peek()
+            if ch == "}":
+                self.pos += 1
+                return
+            self.expect(",")
+
+    def iter_array(self):
+        """ Yields indices of an array, the caller must consume each item.
+        """
+
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        idx = 0
+        while True:
+            yield idx
+            idx += 1
+            if self.peek() == "]":
+                self.pos += 1
+                return
+            self.expect(",")
+
+    def parse_value(self):
+        ch = self.peek()
+        if ch == '"':
+            self.pos += 1
+            return self.read_string()
+        if ch not in ("{", "["):
+            return self.read_scalar()
+
+        # find the end with the fast skip, then let the C decoder build the container
+        self._pin = self.pos
+        try:
+            self.skip_value()
+            start, end = self._pin, self.pos
+        finally:
+            self._pin = None
+        try:
+            value, decoded_end = _DECODER.raw_decode(self.buf, start)
+        except json.JSONDecodeError as e:
+            self.pos = e.pos
+            raise self.error(e.msg) from None
+        except RecursionError:
+            # the C decoder recurses into containers, deep ones are built iteratively
+            self.pos = start
+            return self.build_value()
+        if decoded_end != end:
+            self.pos = decoded_end
+            raise self.error("Expecting ',' delimiter")
+        return value
+
+    def build_value(self):
+        """ Builds a value with an explicit stack of open containers, so any nesting works.
+        """
+
+        root = []
+        stack = [(root, iter((0,)))]  # (container, its keys or indices) of open containers
+        while stack:
+            container, keys = stack[-1]
+            key = next(keys, _END)
+            if key is _END:
+                stack.pop()
+                continue
+
+            ch = self.peek()
+            if ch == "{":
+                value, value_keys = {}, self.iter_object()
+            elif ch == "[":
+                value, value_keys = [], self.iter_array()
+            elif ch == '"':
+                self.pos += 1
+                value, value_keys = self.read_string(), None
+            else:
+                value, value_keys = self.read_scalar(), None
+
+            if type(container) is list:
+                container.append(value)
+            else:
+                container[key] = value
+            if value_keys is not None:
+                stack.append((value, value_keys))
+        return root[0]
+
+    def skip_value(self):
+        """ Consumes a value without building it. Containers are not validated.
+        """
+
+        ch = self.peek()
+        if ch == '"':
+            self.pos += 1
+            self.pos = self._string_end()
+            return
+        if ch not in ("{", "["):
+            self.read_scalar()
+            return
+
+        depth = 0
+        while True:
+            self.pos = _PLAIN.match(self.buf, self.pos).end()
+            if self.pos == len(self.buf):
+                if not self._more():
+                    raise self.error("Unterminated container")
+                continue
+            ch = self.buf[self.pos]
+            self.pos += 1
+            if ch == '"':
+                self.pos = self._string_end()
+            elif ch in "{[":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+
+def _stream_match(reader, plan):
+    while isinstance(plan, (_MatcherWrap, MayBe, DictContains)):
+        plan = plan._plan
+
+    if type(plan) is _Literal and plan.value is Any:
+        if not reader.peek():
+            raise reader.error("Expecting value")
+        reader.skip_value()
+        return
+
+    if type(plan) in (_DictPlan, _SeqPlan) and plan._deep:
+        # streaming follows the plan recursively, deep plans match built values iteratively
+        return plan._match(reader.build_value())
+
+    ch = reader.peek()
+    if type(plan) is _DictPlan and ch == "{":
+        return _stream_object(reader, plan)
+    if type(plan) is EachIs and ch == "[":
+        # items are usually small records, building them in C beats streaming their keys
+        item_plan = plan._plan
+        for idx in reader.iter_array():
+            try:
+                if type(item_plan) is _Literal and item_plan.value is Any:
+                    reader.skip_value()
+                else:
+                    item_plan._match(reader.parse_value())
+            except Mismatch as e:
+                raise e.prepend(str(idx))
+        return
+
+    if type(plan) is _SeqPlan and plan._type is list and not plan._literal and ch == "[":
+        return _stream_array(reader, plan)
+
+    plan._match(reader.parse_value())
+
+
+def _stream_array(reader, plan):
+    count = len(plan.plans)
+    idx = -1
+    for idx in reader.iter_array():
+        if idx == count:
+            raise Mismatch(_SKIPPED_LIST, "", f"invalid length - got more than {count}, "
+                                              f"expected {count}")
+        try:
+            _stream_match(reader, plan.plans[idx])
+        except Mismatch as e:
+            raise e.prepend(str(idx))
+    if idx + 1 != count:
+        raise Mismatch(_SKIPPED_LIST, "", f"invalid length - got {idx + 1}, expected {count}")
+
+
+def _stream_object(reader, plan):
+    seen = {}
+    unexpected_keys = []
+    for key in reader.iter_object():
+        seen[key] = _SKIPPED
+        value_plan = plan.plans.get(key)
+        if value_plan is None or key in plan.absent:
+            if value_plan is not None or not plan.allow_unexpected:
+                unexpected_keys.append(key)
+            reader.skip_value()
+            continue
+
+        try:
+            _stream_match(reader, value_plan)
+        except Mismatch as e:
+            raise e.prepend(key)
+
+    missing_keys = sorted(k for k in plan.required if k not in seen)
+    if missing_keys:
+        raise Mismatch.missing_keys(seen, missing_keys)
+    if unexpected_keys:
+        raise Mismatch.unexpected_keys(seen, unexpected_keys)
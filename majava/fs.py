@@ -1,5 +1,26 @@
-from .matchers import Matcher, Mismatch
+from .matchers import Matcher, Mismatch, compile_plan, _consumes, _is_missing, Absent
+from .polling import Backoff
+from .report import short_repr
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import codecs
+import ctypes
+import ctypes.util
+import fnmatch
+import functools
+import glob
+import mmap
 import os
+import re
+import select
+import stat
+import sys
+import time
+
+
+def _is_empty_dir(path):
+    with os.scandir(path) as it:
+        return next(it, None) is None
 
 
 class _IsDirectory(Matcher):
@@ -20,14 +41,716 @@ class _IsDirectory(Matcher):
             raise Mismatch(other, "", f"is not a directory (invalid type - {e})") from e
 
         if self._is_empty is not None:
-            is_empty = not os.listdir(other)
+            is_empty = _is_empty_dir(other)
             if self._is_empty and not is_empty:
                 raise Mismatch(other, "", "directory is not empty")
             if not self._is_empty and is_empty:
                 raise Mismatch(other, "", "directory is empty")
 
+    def _matches(self, other):
+        try:
+            if not os.path.isdir(other):
+                return False
+        except TypeError:
+            return False
+
+        if self._is_empty is not None:
+            return self._is_empty == _is_empty_dir(other)
+        return True
+
     def __call__(self, **kwargs):
         return self.__class__(**kwargs)
 
+    def __reduce__(self):
+        if self._is_empty is None:
+            return "IsDirectory"  # the singleton
+        return type(self), (self._is_empty,)
+
 
 IsDirectory = _IsDirectory()
+
+
+class File(Matcher):
+    """ Path (or `os.DirEntry`) is a regular file with optional size and permission bits.
+    """
+
+    def __init__(self, size=None, mode=None):
+        self.size = size
+        self.mode = mode
+        self._size_plan = None if size is None else compile_plan(size)
+
+    def __repr__(self):
+        params = []
+        if self.size is not None:
+            params.append(f"size={self.size!r}")
+        if self.mode is not None:
+            params.append(f"mode={self.mode:#o}")
+        return f"File({', '.join(params)})"
+
+    def _stat(self, other):
+        if isinstance(other, os.DirEntry):
+            return other.stat()
+        return os.stat(other)
+
+    def _match(self, other):
+        try:
+            st = self._stat(other)
+        except (OSError, TypeError) as e:
+            raise Mismatch(other, "", f"is not a file ({e})") from e
+
+        if isinstance(other, os.DirEntry):
+            other = other.path
+        if not stat.S_ISREG(st.st_mode):
+            raise Mismatch(other, "", "is not a file")
+
+        if self._size_plan is not None:
+            try:
+                self._size_plan._match(st.st_size)
+            except Mismatch as e:
+                raise e.prepend("size")
+        if self.mode is not None and stat.S_IMODE(st.st_mode) != self.mode:
+            raise Mismatch(other, "", f"mode is {stat.S_IMODE(st.st_mode):#o}, "
+                                      f"expected {self.mode:#o}")
+
+    def _matches(self, other):
+        try:
+            st = self._stat(other)
+        except (OSError, TypeError):
+            return False
+        return stat.S_ISREG(st.st_mode) \
+            and (self._size_plan is None or self._size_plan._matches(st.st_size)) \
+            and (self.mode is None or stat.S_IMODE(st.st_mode) == self.mode)
+
+
+class DirectoryTree(Matcher):
+    """ Directory contains entries matching the expected tree, e.g.
+
+        DirectoryTree({
+            "report.json": File(size=InInterval(1, 10_000)),
+            "logs": {"*.log": Any, "core": Absent},
+            "tmp": MayBe(IsDirectory(is_empty=True)),
+        })
+
+    Keys are names or glob patterns, nested dicts are subdirectories.
+    Entries are passed to matchers as paths (`os.DirEntry` to `File`).
+    Only directories mentioned by the expectation are listed, and not even those
+    when all keys are plain names and unexpected entries are allowed.
+    With `stat_workers` entries are checked in a thread pool, which pays off
+    on network filesystems.
+    """
+
+    def __init__(self, expected: dict, *, allow_unexpected=False, stat_workers=0):
+        self.expected = expected
+        self.allow_unexpected = allow_unexpected
+        self.stat_workers = stat_workers
+        self._names = {}
+        self._patterns = {}
+        for key, value in expected.items():
+            if isinstance(value, dict):
+                value = DirectoryTree(
+                    value, allow_unexpected=allow_unexpected, stat_workers=stat_workers)
+            plans = self._patterns if glob.has_magic(key) else self._names
+            plans[key] = compile_plan(value)
+        self._explain_first = _consumes([*self._names.values(), *self._patterns.values()])
+        self._required = [k for k, v in expected.items() if _is_missing(v)]
+        self._absent = {k for k, v in expected.items() if v is Absent}
+
+    def __repr__(self):
+        return f"DirectoryTree({short_repr(self.expected)})"
+
+    def _match(self, other):
+        try:
+            if not os.path.isdir(other):
+                raise Mismatch(other, "", "is not a directory")
+        except TypeError as e:
+            raise Mismatch(other, "", f"is not a directory (invalid type - {e})") from e
+
+        if self._patterns or not self.allow_unexpected:
+            tasks, found, unexpected = self._scan(other)
+        else:
+            tasks, found, unexpected = self._lookup(other)
+
+        for name, mismatch in self._run(tasks):
+            if mismatch is not None:
+                raise mismatch.prepend(name)
+
+        missing = [k for k in self._required if k not in found]
+        if missing:
+            raise Mismatch.missing_keys(other, missing)
+        if unexpected:
+            raise Mismatch.unexpected_keys(other, unexpected)
+
+    def _matches(self, other):
+        try:
+            if not os.path.isdir(other):
+                return False
+        except TypeError:
+            return False
+
+        if self._patterns or not self.allow_unexpected:
+            tasks, found, unexpected = self._scan(other)
+        else:
+            tasks, found, unexpected = self._lookup(other)
+        if unexpected or any(k not in found for k in self._required):
+            return False
+
+        if self.stat_workers and len(tasks) > 1:
+            pool = ThreadPoolExecutor(self.stat_workers)
+            try:
+                return all(pool.map(_entry_matches, tasks))
+            finally:
+                pool.shutdown(cancel_futures=True)  # checks after the first failure are dropped
+        return all(plan._matches(target) for _, target, plan in tasks)
+
+    def _lookup(self, path):
+        """ Checks expected names directly, without listing the directory.
+        """
+
+        tasks, found, unexpected = [], set(), []
+        for name, plan in self._names.items():
+            entry_path = os.path.join(path, name)
+            if not os.path.lexists(entry_path):
+                continue
+            found.add(name)
+            if name in self._absent:
+                unexpected.append(name)
+            else:
+                tasks.append((name, entry_path, plan))
+        return tasks, found, unexpected
+
+    def _scan(self, path):
+        tasks, found, unexpected = [], set(), []
+        with os.scandir(path) as it:
+            for entry in it:
+                name = entry.name
+                key = name if name in self._names else next(
+                    (p for p in self._patterns if fnmatch.fnmatchcase(name, p)), None)
+                if key is None:
+                    if not self.allow_unexpected:
+                        unexpected.append(name)
+                    continue
+
+                found.add(key)
+                if key in self._absent:
+                    unexpected.append(name)
+                    continue
+                plan = self._names[key] if key in self._names else self._patterns[key]
+                # DirEntry caches stat results, other matchers get plain paths
+                tasks.append((name, entry if isinstance(plan, File) else entry.path, plan))
+        return tasks, found, unexpected
+
+    def _run(self, tasks):
+        if self.stat_workers and len(tasks) > 1:
+            with ThreadPoolExecutor(self.stat_workers) as pool:
+                yield from zip((t[0] for t in tasks), pool.map(_explain_entry, tasks))
+            return
+        for task in tasks:
+            yield task[0], _explain_entry(task)
+
+
+def _entry_matches(task):
+    _, target, plan = task
+    return plan._matches(target)
+
+
+def _explain_entry(task):
+    _, target, plan = task
+    if not plan._explain_first and plan._matches(target):
+        return None
+    try:
+        plan._match(target)
+    except Mismatch as e:
+        return e
+    return None
+
+
+_LINE_CHUNK = 1 << 20
+
+
+@contextmanager
+def _mapped(path):
+    """ Maps the file read-only, empty files are mapped to b"".
+    """
+
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            yield b""
+            return
+        try:
+            yield mm
+        finally:
+            mm.close()
+
+
+def _line_at(data, offset):
+    """ Returns the 1-based line number of the byte offset, copying at most a chunk at a time.
+    """
+
+    view = memoryview(data)
+    try:
+        return 1 + sum(
+            bytes(view[i:min(i + _LINE_CHUNK, offset)]).count(b"\n")
+            for i in range(0, offset, _LINE_CHUNK)
+        )
+    finally:
+        view.release()
+
+
+def _first_difference(a, b):
+    """ Returns the first offset where buffers differ or None, comparing without copies.
+    """
+
+    va, vb = memoryview(a), memoryview(b)
+    try:
+        size = min(len(va), len(vb))
+        lo = 0
+        for lo in range(0, size, _LINE_CHUNK):
+            hi = min(lo + _LINE_CHUNK, size)
+            if va[lo:hi] != vb[lo:hi]:
+                break
+        else:
+            return None if len(va) == len(vb) else size
+
+        while hi - lo > 1:  # bisect the chunk for the first differing byte
+            mid = (lo + hi) // 2
+            if va[lo:mid] == vb[lo:mid]:
+                lo = mid
+            else:
+                hi = mid
+        return lo
+    finally:
+        va.release()
+        vb.release()
+
+
+class _FileContent(Matcher):
+    """ Base for matchers of file contents. Files are memory-mapped, never read whole.
+    Subclasses provide `_check(data)` returning None or a mismatch message.
+    """
+
+    def _match(self, other):
+        try:
+            with _mapped(other) as data:
+                msg = self._check(data)
+        except (OSError, TypeError) as e:
+            raise Mismatch(other, "", f"can't read file ({e})") from e
+        if msg is not None:
+            raise Mismatch(other, "", msg)
+
+    def _matches(self, other):
+        try:
+            with _mapped(other) as data:
+                return self._check(data) is None
+        except (OSError, TypeError):
+            return False
+
+    def _hits_msg(self, data, what, hits):
+        """ Describes occurrences given as (count, first offset) or returns None if they match.
+        """
+
+        count, first = hits
+        if (count >= 1) if self._count_plan is None else self._count_plan._matches(count):
+            return None
+        if first is None:
+            return f"does not contain {what}"
+        line = _line_at(data, first)
+        return f"contains {what} {count} time(s), first at offset {first} (line {line}), " \
+               f"expected {self.count!r}"
+
+
+def _to_bytes(value, encoding):
+    return value.encode(encoding) if isinstance(value, str) else bytes(value)
+
+
+class FileContains(_FileContent):
+    """ File contains the bytes (or string), `count` may be a number or a matcher,
+    by default at least one occurrence is required.
+    """
+
+    def __init__(self, needle, *, count=None, encoding="utf-8"):
+        self.needle = needle
+        self.count = count
+        self._needle = _to_bytes(needle, encoding)
+        self._count_plan = None if count is None else compile_plan(count)
+
+    def __repr__(self):
+        return f"FileContains({short_repr(self.needle)})"
+
+    def _check(self, data):
+        return self._hits_msg(data, repr(self.needle), self._hits(data))
+
+    def _hits(self, data):
+        first = data.find(self._needle)
+        if first == -1:
+            return 0, None
+        if self.count is None:
+            return 1, first
+        count, pos = 0, first
+        while pos != -1:
+            count += 1
+            pos = data.find(self._needle, pos + max(len(self._needle), 1))
+        return count, first
+
+
+class FileMatches(_FileContent):
+    """ File has a match of the regular expression (bytes, or str encoded to bytes),
+    `count` may be a number or a matcher, by default at least one match is required.
+    """
+
+    def __init__(self, pattern, *, count=None, flags=0, encoding="utf-8"):
+        self.pattern = pattern
+        self.count = count
+        self._regex = re.compile(_to_bytes(pattern, encoding), flags)
+        self._count_plan = None if count is None else compile_plan(count)
+
+    def __repr__(self):
+        return f"FileMatches({self.pattern!r})"
+
+    def _check(self, data):
+        return self._hits_msg(data, f"a match of {self.pattern!r}", self._hits(data))
+
+    def _hits(self, data):
+        if self.count is None:
+            m = self._regex.search(data)
+            return (1, m.start()) if m else (0, None)
+        count, first = 0, None
+        for m in self._regex.finditer(data):
+            if first is None:
+                first = m.start()
+            count += 1
+        return count, first
+
+
+class FileEquals(_FileContent):
+    """ File content equals the bytes (or string), or the content of another file
+    if `os.PathLike` is given.
+    """
+
+    def __init__(self, expected, *, encoding="utf-8"):
+        self.expected = expected
+        self._expected = None if isinstance(expected, os.PathLike) \
+            else _to_bytes(expected, encoding)
+
+    def __repr__(self):
+        return f"FileEquals({short_repr(self.expected)})"
+
+    def _check(self, data):
+        if self._expected is not None:
+            return self._diff(data, self._expected)
+        with _mapped(self.expected) as expected:
+            return self._diff(data, expected)
+
+    def _diff(self, data, expected):
+        offset = _first_difference(data, expected)
+        if offset is None:
+            return None
+        where = f"offset {offset} (line {_line_at(data, offset)})"
+        if offset == len(data):
+            return f"file is shorter than expected - ends at {where}"
+        if offset == len(expected):
+            return f"file is longer than expected - extra data at {where}"
+        return f"differs at {where}"
+
+
+class FileSize(Matcher):
+    """ File size matches the expected number or matcher.
+    """
+
+    def __init__(self, expected):
+        self.expected = expected
+        self._plan = compile_plan(expected)
+
+    def __repr__(self):
+        return f"FileSize({self.expected!r})"
+
+    def _match(self, other):
+        try:
+            size = os.stat(other).st_size
+        except (OSError, TypeError) as e:
+            raise Mismatch(other, "", f"can't stat file ({e})") from e
+        try:
+            self._plan._match(size)
+        except Mismatch as e:
+            raise e.prepend("size")
+
+    def _matches(self, other):
+        try:
+            return self._plan._matches(os.stat(other).st_size)
+        except (OSError, TypeError):
+            return False
+
+
+# inotify(7) events of a path and, for directories, of their entries
+_IN_MODIFY = 0x2
+_IN_ATTRIB = 0x4
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_FROM = 0x40
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_MOVE_SELF = 0x800
+_WATCH_MASK = _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO \
+    | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF
+
+
+@functools.lru_cache(maxsize=None)
+def _inotify_functions():
+    """ Returns (inotify_init1, inotify_add_watch) of libc or None if inotify is unavailable.
+    """
+
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        init, add_watch = libc.inotify_init1, libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    init.argtypes = [ctypes.c_int]
+    init.restype = ctypes.c_int
+    add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    add_watch.restype = ctypes.c_int
+    return init, add_watch
+
+
+class _Watcher:
+    """ Waits for changes of the paths (and of entries of directories among them)
+    with inotify, or just sleeps if it is unavailable.
+    """
+
+    def __init__(self, paths):
+        self._paths = [os.fsencode(p) for p in paths]
+        self._fd = None
+        functions = _inotify_functions()
+        if functions is not None:
+            init, self._add_watch = functions
+            fd = init(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0:
+                self._fd = fd
+                self._watch()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _watch(self):
+        # watches are dropped with deleted paths and re-adding an existing one is a no-op,
+        # so all the paths are (re)added, those not existing yet fail
+        for path in self._paths:
+            self._add_watch(self._fd, path, _WATCH_MASK)
+
+    def wait(self, timeout):
+        """ Waits up to the timeout, returns if something has changed.
+        """
+
+        if self._fd is None:
+            time.sleep(timeout)
+            return False
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            while os.read(self._fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        self._watch()
+        return True
+
+
+class _WaitFor(Matcher):
+    """ Base for matchers waiting until a path matches: checks are run when the path
+    or its directory change according to inotify, and with adaptive backoff otherwise.
+    Subclasses provide `_start(path)` returning the state of a wait, `_check(path, state)`
+    and `_mismatch(path, state, reason)`.
+    """
+
+    _explain_first = True
+
+    def __init__(self, expected, timeout, interval, max_interval):
+        self.expected = expected
+        self.timeout = timeout
+        self.interval = interval
+        self.max_interval = max_interval
+        self._plan = compile_plan(expected)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({short_repr(self.expected)}, timeout={self.timeout})"
+
+    def _start(self, path):
+        return None
+
+    def _match(self, other):
+        try:
+            path = os.fspath(other)
+        except TypeError as e:
+            raise Mismatch(other, "", f"invalid type - {e}") from e
+
+        state = self._start(path)
+        try:
+            backoff = Backoff(self.timeout, self.interval, self.max_interval)
+            with _Watcher([os.path.dirname(path) or os.curdir, path]) as watcher:
+                changed = False
+                while not self._check(path, state):
+                    delay = backoff.next_delay(changed)
+                    if delay is None:
+                        break
+                    changed = watcher.wait(delay)
+                else:
+                    return
+            mismatch = self._mismatch(other, state, f"still after {self.timeout}s")
+        finally:
+            if state is not None:
+                state.close()
+        if mismatch is not None:
+            raise mismatch
+
+
+class WaitForFile(_WaitFor):
+    """ Path matches the expectation, `File()` by default, within the timeout, e.g.
+
+        assert out_path == WaitForFile(File(size=InInterval(1, None)), timeout=30)
+    """
+
+    def __init__(self, expected=None, timeout=5.0, interval=0.01, *, max_interval=1.0):
+        super().__init__(File() if expected is None else expected,
+                         timeout, interval, max_interval)
+
+    def _check(self, path, state):
+        return self._plan._matches(path)
+
+    def _mismatch(self, other, state, reason):
+        mismatch = self._plan.explain(other)
+        if mismatch is None:
+            return None
+        return Mismatch(mismatch.value, mismatch.path, f"{mismatch.msg} ({reason})")
+
+
+class WaitForDirectory(WaitForFile):
+    """ Path matches the expectation, `IsDirectory` by default, within the timeout, e.g.
+
+        assert spool == WaitForDirectory(IsDirectory(is_empty=False))
+        assert out_dir == WaitForDirectory(DirectoryTree({"*.csv": File()}))
+
+    Changes deeper than entries of the directory are noticed by polling only.
+    """
+
+    def __init__(self, expected=None, timeout=5.0, interval=0.01, *, max_interval=1.0):
+        super().__init__(IsDirectory if expected is None else expected,
+                         timeout, interval, max_interval=max_interval)
+
+
+class _Tail:
+    """ Content of a growing file read incrementally from the last offset.
+    A truncated or replaced (e.g. rotated) file is read again from the start.
+    """
+
+    def __init__(self, path, encoding):
+        self.path = path
+        self.encoding = encoding
+        self.empty = b"" if encoding is None else ""
+        self.error = None
+        self._file = None
+        self._id = None
+        self.offset = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def read(self):
+        """ Returns (appended data, if reading started over), data is "" if nothing was read.
+        """
+
+        restarted = False
+        try:
+            st = os.stat(self.path)
+            if self._file is not None and ((st.st_dev, st.st_ino) != self._id
+                                           or st.st_size < self.offset):
+                self.close()
+                restarted = True
+            if self._file is None:
+                self._file = open(self.path, "rb")
+                st = os.fstat(self._file.fileno())
+                self._id = (st.st_dev, st.st_ino)
+                self.offset = 0
+                self._decoder = None if self.encoding is None else \
+                    codecs.getincrementaldecoder(self.encoding)("replace")
+            data = self._file.read()
+        except OSError as e:
+            self.error = e
+            return self.empty, restarted
+
+        self.error = None
+        self.offset += len(data)
+        return (data if self._decoder is None else self._decoder.decode(data)), restarted
+
+
+class _ContentState(_Tail):
+    def __init__(self, path, encoding):
+        super().__init__(path, encoding)
+        self.content = self.empty  # all the content or the incomplete last line
+        self.lines = 0
+        self.checked = False
+
+
+class WaitForContent(_WaitFor):
+    """ Content of the file matches the expectation within the timeout, or with `lines=True`
+    one of its lines does (without the line break). The file is read as it grows,
+    only appended data is read and with `lines=True` only new lines are matched, e.g.
+
+        assert log_path == WaitForContent(Search(r"^listening on \\d+$", flags=re.M))
+        assert log_path == WaitForContent(StartsWith("ERROR"), lines=True, timeout=30)
+
+    Content is decoded with the encoding, or is bytes with `encoding=None`.
+    """
+
+    def __init__(self, expected, timeout=5.0, interval=0.01, *, lines=False, encoding="utf-8",
+                 max_interval=1.0):
+        super().__init__(expected, timeout, interval, max_interval)
+        self.lines = lines
+        self.encoding = encoding
+
+    def _start(self, path):
+        return _ContentState(path, self.encoding)
+
+    def _check(self, path, state):
+        data, restarted = state.read()
+        if restarted:
+            state.content = state.empty
+        if not self.lines:
+            if data or restarted or not state.checked:
+                state.checked = True
+                state.content += data
+                return self._plan._matches(state.content)
+            return False
+
+        if not data:
+            return False
+        newline = "\n" if self.encoding is not None else b"\n"
+        lines = (state.content + data).split(newline)
+        state.content = lines.pop()
+        for line in lines:
+            state.lines += 1
+            if self._plan._matches(line[:-1] if line[-1:] in ("\r", b"\r") else line):
+                return True
+        return False
+
+    def _mismatch(self, other, state, reason):
+        if state.error is not None:
+            return Mismatch(other, "", f"can't read file ({state.error}) ({reason})")
+        if self.lines:
+            return Mismatch(other, "", f"no line matches {short_repr(self.expected)} "
+                                       f"({reason}, {state.lines} line(s) read)")
+        mismatch = self._plan.explain(state.content)
+        if mismatch is None:
+            return None
+        return Mismatch(mismatch.value, mismatch.path,
+                        f"{mismatch.msg} (content of {short_repr(other)} {reason})")
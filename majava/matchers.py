@@ -1,8 +1,17 @@
+from collections.abc import Iterator
+from contextvars import ContextVar
 from typing import Optional, Type, Callable
+from .dispatch import views
+from .report import short_repr, items_repr
 import inspect
+import math
 
 
 class Mismatch(Exception):
+    """ Mismatch of a value at a path. Its text is rendered on demand and is size-bounded,
+    so reports on huge values stay cheap. `msg` may be given as a callable returning it.
+    """
+
     @classmethod
     def invalid_type(cls, value, expected_type, path=""):
         return cls(value, path, f"invalid type - got {type(value)}, expected {expected_type}")
@@ -13,18 +22,27 @@ class Mismatch(Exception):
 
     @classmethod
     def missing_keys(cls, value, keys, path=""):
-        keys_str = ", ".join(repr(i) for i in keys)
-        return cls(value, path, f"missing items with keys: {keys_str}")
+        return cls(value, path, lambda: f"missing items with keys: {items_repr(keys)}")
 
     @classmethod
     def unexpected_keys(cls, value, keys, path=""):
-        keys_str = ", ".join(repr(i) for i in keys)
-        raise Mismatch(value, "", f"unexpected items with keys: {keys_str}")
+        raise Mismatch(value, "", lambda: f"unexpected items with keys: {items_repr(keys)}")
 
     @classmethod
     def missing_items(cls, value, items, path=""):
-        items_str = ", ".join(repr(i) for i in items)
-        raise Mismatch(value, "", f"missing items: {items_str}")
+        raise Mismatch(value, "", lambda: f"missing items: {items_repr(items)}")
+
+    @classmethod
+    def unmatched_items(cls, value, missing, unexpected, path=""):
+        def msg():
+            parts = []
+            if missing:
+                parts.append("missing items: " + items_repr(missing))
+            if unexpected:
+                parts.append("unexpected items: " + items_repr(unexpected))
+            return "; ".join(parts)
+
+        return cls(value, path, msg)
 
     @classmethod
     def missing_item(cls, value, path=""):
@@ -37,7 +55,16 @@ class Mismatch(Exception):
     def __init__(self, value, path, msg):
         self.value = value
         self.path = path
-        self.msg = msg
+        self._msg = msg
+
+    @property
+    def msg(self) -> str:
+        if callable(self._msg):
+            self._msg = self._msg()
+        return self._msg
+
+    def __reduce__(self):
+        return type(self), (self.value, self.path, self.msg)
 
     def prepend(self, path):
         self.path = f"{path}.{self.path}" if self.path else path
@@ -45,23 +72,45 @@ class Mismatch(Exception):
 
     def __str__(self):
         if not self.path:
-            return f"Value {repr(self.value)} does not match: {self.msg}"
-        return f"Value {repr(self.value)} at {repr(self.path)} does not match: {self.msg}"
+            return f"Value {short_repr(self.value)} does not match: {self.msg}"
+        return f"Value {short_repr(self.value)} at {repr(self.path)} does not match: {self.msg}"
+
+
+# (matcher, value, mismatch) of the last failed comparison in the current thread/task
+_last_mismatch = ContextVar("majava_last_mismatch", default=None)
+# callables invoked with every new Matcher subclass, e.g. by the profiler
+_subclass_hooks = []
 
 
 class Matcher:
     """ Base class for all matchers.
+    Matchers keep no per-call state, so one instance may be used from many threads.
     """
 
-    _mismatch = None
+    _literal = False
+    # levels of dict and sequence plans in the expectation, see `_compile_tree`;
+    # matchers with a height yield what they check by `_steps(other)`, see `_run`
+    _height = 0
+    # matchers consuming the value (e.g. polling it) are evaluated once, by `_match`,
+    # containers of such matchers set it too, see `_consumes`
+    _explain_first = False
+    # makes numpy arrays defer `array == matcher` to the matcher instead of broadcasting
+    __array_ufunc__ = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for hook in _subclass_hooks:
+            hook(cls)
 
     def __eq__(self, other):
+        # one-shot iterators can be examined only once, so they go straight to `_match`
+        if not (self._explain_first or isinstance(other, Iterator)) and self._matches(other):
+            return True
         try:
             self._match(other)
-            self._mismatch = None
             return True
         except Mismatch as e:
-            self._mismatch = e
+            _last_mismatch.set((self, other, e))
             return False
 
     def __and__(self, other):
@@ -70,9 +119,47 @@ class Matcher:
     def __or__(self, other):
         return Or(self, other)
 
+    def matches(self, value) -> bool:
+        """ Checks the value without building a mismatch report.
+        """
+
+        return self._matches(value)
+
+    def explain(self, value) -> Optional[Mismatch]:
+        """ Returns the mismatch for the value or None if it matches.
+        """
+
+        try:
+            self._match(value)
+        except Mismatch as e:
+            return e
+        return None
+
     def _match(self, other) -> Optional[str]:
         pass
 
+    def _matches(self, other) -> bool:
+        """ Fast path of `_match`, must not raise Mismatch.
+        Built-in matchers override it, the default one is for custom matchers.
+        """
+
+        try:
+            self._match(other)
+            return True
+        except Mismatch:
+            return False
+
+
+def last_mismatch(matcher: Matcher, value) -> Optional[Mismatch]:
+    """ Returns the mismatch of the last failed `value == matcher` in the current context.
+    Falls back to matching again if that comparison was made elsewhere.
+    """
+
+    last = _last_mismatch.get()
+    if last is not None and last[0] is matcher and last[1] is value:
+        return last[2]
+    return matcher.explain(value)
+
 
 def make_matcher(fn: Callable) -> Type[Matcher]:
     """ Decorates a function to become a matcher.
@@ -95,8 +182,8 @@ def make_matcher(fn: Callable) -> Type[Matcher]:
             self.kwargs = kwargs
 
         def __repr__(self):
-            args_str = ", ".join(repr(i) for i in self.args)
-            kwargs_str = ", ".join(f"{k}={v!r}" for k, v in self.kwargs.items())
+            args_str = ", ".join(short_repr(i) for i in self.args)
+            kwargs_str = ", ".join(f"{k}={short_repr(v)}" for k, v in self.kwargs.items())
             content_str = ", ".join(filter(None, [args_str, kwargs_str]))
             return f"{name}({content_str})"
 
@@ -104,22 +191,47 @@ def make_matcher(fn: Callable) -> Type[Matcher]:
             if fn(other, *self.args, **self.kwargs) is False:
                 raise Mismatch(other, "", f"not {self}")
 
-    M.__qualname__ = name
+        def _matches(self, other):
+            try:
+                return fn(other, *self.args, **self.kwargs) is not False
+            except Mismatch:
+                return False
+
+    # the decorated name refers to the class, so instances pickle by reference to it
+    M.__qualname__ = fn.__qualname__
     M.__name__ = name
+    M.__module__ = fn.__module__
     M.__doc__ = fn.__doc__
 
     return M
 
 
+def _consumes(plans):
+    """ If some of the plans consume values, so the container of them must be evaluated
+    by `_match` only too.
+    """
+
+    return any(p._explain_first for p in plans)
+
+
 class _MatcherWrap(Matcher):
     def __init__(self, v):
         self.v = v
+        self._plan = compile_plan(v)
+        self._explain_first = self._plan._explain_first
+        self._height = self._plan._height
 
     def __repr__(self):
-        return repr(self.v)
+        return short_repr(self.v)
+
+    def _steps(self, other):
+        yield None, self._plan, other
 
     def _match(self, other):
-        _match(self.v, other)
+        self._plan._match(other)
+
+    def _matches(self, other):
+        return self._plan._matches(other)
 
 
 def matcher(value) -> Matcher:
@@ -130,9 +242,90 @@ def matcher(value) -> Matcher:
     return _MatcherWrap(value)
 
 
-def _check_type(value, types):
-    if not isinstance(value, types):
+def compile_plan(expected) -> Matcher:
+    """ Compiles an expectation tree into a reusable matching plan.
+    Type dispatch is resolved once here, pure literal subtrees are checked with a single `==`.
+    """
+
+    if isinstance(expected, Matcher):
+        return expected
+    if isinstance(expected, (dict, list, tuple)):
+        return _compile_tree(expected)
+    return _Literal(expected)
+
+
+# plans nested deeper than this (or cyclic) are matched by the iterative engine, `_run`
+_MAX_HEIGHT = 200
+
+
+def _compile_tree(expected):
+    """ Compiles nested dicts, lists and tuples with an explicit stack, so the depth of
+    the expectation is not limited by the recursion limit. A container met again gets
+    the same node, which makes plans of self-referential expectations cyclic.
+    """
+
+    nodes = {}  # id of container -> node
+    root = nodes[id(expected)] = _pending_node(expected)
+    stack = [(root, iter(_node_values(expected)), [])]
+    while stack:
+        node, values, plans = stack[-1]
+        for value in values:
+            if isinstance(value, Matcher) or not isinstance(value, (dict, list, tuple)):
+                plans.append(compile_plan(value))
+                continue
+            child = nodes.get(id(value))
+            if child is None:
+                child = nodes[id(value)] = _pending_node(value)
+                stack.append((child, iter(_node_values(value)), []))
+                plans.append(child)
+                break
+            plans.append(child)
+        else:
+            stack.pop()
+            node._link(plans)
+    return root
+
+
+def _pending_node(expected):
+    return (_DictPlan if isinstance(expected, dict) else _SeqPlan)._pending(expected)
+
+
+def _node_values(expected):
+    return expected.values() if isinstance(expected, dict) else expected
+
+
+def _is_literal(value):
+    seen = set()
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, (Matcher, _Any, _Absent)):
+            return False
+        if isinstance(value, (dict, list, tuple)) and id(value) not in seen:
+            seen.add(id(value))
+            stack.extend(value.values() if isinstance(value, dict) else value)
+    return True
+
+
+def _viewed(value, types):
+    """ Returns the value or its registered view if it is of the types, or None.
+    """
+
+    if isinstance(value, types):
+        return value
+    view = views.dispatch(type(value))
+    if view is not None:
+        value = view(value)
+        if isinstance(value, types):
+            return value
+    return None
+
+
+def _check_view(value, types):
+    viewed = _viewed(value, types)
+    if viewed is None:
         raise Mismatch.invalid_type(value, types)
+    return viewed
 
 
 def _check_len(value, expected):
@@ -146,22 +339,327 @@ def _match(matcher, value):
         return matcher._match(value)
 
     if isinstance(matcher, dict):
-        _check_type(value, dict)
-        return _match_dict(matcher, value)
+        return _DictPlan(matcher)._match(value)
+
+    if isinstance(matcher, (list, tuple)):
+        return _SeqPlan(matcher)._match(value)
 
-    if matcher == value:
+    _match_literal(matcher, value)
+
+
+def _match_literal(expected, value):
+    if expected == value:
         return
-    if matcher is Absent:
+    if expected is Absent:
         raise Mismatch.unexpected_item(value)
     if value is Absent:
         raise Mismatch.missing_item(value)
-    raise Mismatch(value, "", f"{repr(value)} != {repr(matcher)}")
+    raise Mismatch(value, "", lambda: f"{short_repr(value)} != {short_repr(expected)}")
+
+
+class _Literal(Matcher):
+    """ Plan node for a plain value compared with `==`.
+    """
+
+    def __init__(self, value):
+        self.value = value
+        self._literal = _is_literal(value)
+
+    def __repr__(self):
+        return short_repr(self.value)
+
+    def _match(self, other):
+        _match_literal(self.value, other)
+
+    def _matches(self, other):
+        if self.value == other:
+            return True
+        return False
+
+
+_NO_VALUE = object()
+
+
+class _DictPlan(Matcher):
+    """ Plan node for a dict expectation with compiled values.
+    Key sets are precomputed, so with `allow_unexpected` the cost depends on the size of
+    the expectation only and strict matching counts keys instead of listing the value.
+    """
+
+    # until the node is linked references to it come from its own subtree, i.e. are cycles
+    _height = math.inf
+
+    def __init__(self, expected: dict, allow_unexpected=False):
+        self.expected = expected
+        self.allow_unexpected = allow_unexpected
+        self._link([compile_plan(v) for v in expected.values()])
+
+    @classmethod
+    def _pending(cls, expected):
+        """ Returns the node to be linked with plans of values by `_compile_tree`.
+        """
+
+        node = cls.__new__(cls)
+        node.expected = expected
+        node.allow_unexpected = False
+        return node
+
+    def _link(self, plans):
+        expected = self.expected
+        self.plans = dict(zip(expected, plans))
+        self.absent = frozenset(k for k, v in expected.items() if v is Absent)
+        self.required = tuple(k for k, v in expected.items() if _is_missing(v))
+        # (key, plan, is required) of keys which values are checked, in expected order
+        self._checked = tuple(
+            (k, p, _is_missing(expected[k])) for k, p in self.plans.items() if k not in self.absent)
+        self._height = 1 + max((p._height for p in plans), default=0)
+        self._deep = self._height > _MAX_HEIGHT
+        self._explain_first = _consumes(plans)
+        # nested dicts check their own type, so only flat levels compare with `==`
+        self._literal = all(type(p) is _Literal and p._literal for p in plans)
+
+    def __repr__(self):
+        return short_repr(self.expected)
+
+    def _steps(self, other):
+        """ Checks the dict itself and yields (key, plan, value) of values to check.
+        Missing and unexpected keys are reported after the values.
+        """
+
+        other = _check_view(other, dict)
+
+        if self._literal:
+            if self.allow_unexpected:
+                if other.items() >= self.expected.items():
+                    return
+            elif self.expected == other:
+                return
+
+        missing_keys = []
+        present = 0
+        for key, plan, required in self._checked:
+            value_v = other.get(key, _NO_VALUE)
+            if value_v is _NO_VALUE:
+                if required:
+                    missing_keys.append(key)
+                continue
+            present += 1
+            yield key, plan, value_v
+
+        if missing_keys:
+            raise Mismatch.missing_keys(other, sorted(missing_keys))
+
+        if self._has_unexpected(other, present):
+            keys = self.plans
+            raise Mismatch.unexpected_keys(other, [
+                k for k in other
+                if k in self.absent or (not self.allow_unexpected and k not in keys)
+            ])
+
+    def _match(self, other):
+        if self._deep:
+            return _run(self, other)
+        for key, plan, value_v in self._steps(other):
+            try:
+                plan._match(value_v)
+            except Mismatch as e:
+                raise e.prepend(key)
+
+    def _has_unexpected(self, other, present):
+        if self.allow_unexpected:
+            return any(k in other for k in self.absent)
+        # all keys of the value are checked ones unless there are more of them
+        return len(other) != present
+
+    def _matches(self, other):
+        if self._deep:
+            return _run(self, other, explain=False)
+        other = _viewed(other, dict)
+        if other is None:
+            return False
+
+        if self._literal:
+            if self.allow_unexpected:
+                return other.items() >= self.expected.items()
+            return self.expected == other
+
+        present = 0
+        for key, plan, required in self._checked:
+            value_v = other.get(key, _NO_VALUE)
+            if value_v is _NO_VALUE:
+                if required:
+                    return False
+                continue
+            present += 1
+            if not plan._matches(value_v):
+                return False
+        return not self._has_unexpected(other, present)
+
+
+def _native_eq(plan):
+    """ If the plan is equivalent to `==` with its expectation (nested dicts check their type).
+    """
+
+    return type(plan) in (_Literal, _SeqPlan) and plan._literal
+
+
+class _SeqPlan(Matcher):
+    """ Plan node for a list or tuple expectation with compiled items: the type and length
+    are checked first, then items with an early exit. Runs of literal items are compared
+    with a single `==` of slices.
+    """
+
+    _height = math.inf  # see _DictPlan
+
+    def __init__(self, expected):
+        self.expected = expected
+        self._type = list if isinstance(expected, list) else tuple
+        self._link([compile_plan(v) for v in expected])
+
+    @classmethod
+    def _pending(cls, expected):
+        node = cls.__new__(cls)
+        node.expected = expected
+        node._type = list if isinstance(expected, list) else tuple
+        return node
+
+    def _link(self, plans):
+        self.plans = tuple(plans)
+        self._height = 1 + max((p._height for p in plans), default=0)
+        self._deep = self._height > _MAX_HEIGHT
+        self._explain_first = _consumes(plans)
+        self._literal = not self._deep and all(_native_eq(p) for p in self.plans)
+
+        # (start, stop, plan) segments: plan is None for literal runs
+        self._segments = []
+        start = 0
+        for idx, plan in enumerate(self.plans + (None,)):
+            if plan is not None and _native_eq(plan):
+                continue
+            if idx > start:
+                self._segments.append((start, idx, None))
+            if plan is not None:
+                self._segments.append((idx, idx + 1, plan))
+            start = idx + 1
+
+    def __repr__(self):
+        return short_repr(self.expected)
+
+    def _steps(self, other):
+        """ Checks the type and length and yields (index, plan, item) of items to check.
+        """
+
+        other = _check_view(other, self._type)
+
+        if self._literal and self.expected == other:
+            return
+        if len(other) != len(self.plans):
+            raise Mismatch.invalid_len(other, len(self.plans))
+
+        expected = self.expected
+        for start, stop, plan in self._segments:
+            if plan is None:
+                if stop - start > 1 and other[start:stop] == expected[start:stop]:
+                    continue
+                for idx in range(start, stop):
+                    yield str(idx), self.plans[idx], other[idx]
+            else:
+                yield str(start), plan, other[start]
+
+    def _match(self, other):
+        if self._deep:
+            return _run(self, other)
+        for idx, plan, item in self._steps(other):
+            try:
+                plan._match(item)
+            except Mismatch as e:
+                raise e.prepend(idx)
+
+    def _matches(self, other):
+        if self._deep:
+            return _run(self, other, explain=False)
+        other = _viewed(other, self._type)
+        if other is None:
+            return False
+        if self._literal:
+            return self.expected == other
+        if len(other) != len(self.plans):
+            return False
+
+        expected = self.expected
+        for start, stop, plan in self._segments:
+            if plan is None:
+                if stop - start == 1:
+                    if not expected[start] == other[start]:
+                        return False
+                elif not other[start:stop] == expected[start:stop]:
+                    return False
+            elif not plan._matches(other[start]):
+                return False
+        return True
+
+
+def _run(plan, value, explain=True):
+    """ Matches the value with a dict or sequence plan using a stack of `_steps` instead of
+    recursion, so any nesting works. Wrappers of such plans (e.g. `MayBe`) are stepped through
+    too, their steps have no key. A cycle - the same plan node meeting the same value
+    object within its own subtree - is reported as a mismatch instead of looping forever.
+    Returns if the value matches, raises the mismatch with `explain`.
+    """
+
+    marker = (id(plan), id(value))
+    active = {marker}
+    stack = [(None, marker, plan._steps(value))]  # (key, marker, steps) of nodes being matched
+    try:
+        while stack:
+            _, marker, steps = stack[-1]
+            for key, child, child_value in steps:
+                if child._height:
+                    child_marker = (id(child), id(child_value))
+                    if child_marker in active:
+                        raise _cycle_mismatch(child_value, key, stack, child_marker)
+                    active.add(child_marker)
+                    stack.append((key, child_marker, child._steps(child_value)))
+                    break
+                if explain:
+                    try:
+                        child._match(child_value)
+                    except Mismatch as e:
+                        raise e if key is None else e.prepend(key)
+                elif not child._matches(child_value):
+                    return False
+            else:
+                stack.pop()
+                active.discard(marker)
+        return True
+    except Mismatch as e:
+        if not explain:
+            return False
+        for key, _, _ in reversed(stack[1:]):
+            if key is not None:
+                e.prepend(key)
+        raise
+
+
+def _cycle_mismatch(value, key, stack, marker):
+    keys = []
+    for frame_key, frame_marker, _ in stack:
+        if frame_key is not None:
+            keys.append(str(frame_key))
+        if frame_marker == marker:
+            break
+    where = repr(".".join(keys)) if keys else "the root"
+    return Mismatch(value, "" if key is None else key,
+                    f"cyclic reference - the value is already being matched at {where}")
 
 
 class And(Matcher):
     def __init__(self, *matchers, repr=None):
         self.matchers = matchers
         self._repr = repr
+        self._plans = tuple(compile_plan(m) for m in matchers)
+        self._explain_first = _consumes(self._plans)
+        self._height = max((p._height for p in self._plans), default=0)
 
     def __and__(self, other):
         return And(*self.matchers, other)
@@ -171,14 +669,44 @@ class And(Matcher):
             return self._repr
         return '&'.join(repr(it) for it in self.matchers)
 
+    def _steps(self, other):
+        for plan in self._plans:
+            yield None, plan, other
+
     def _match(self, other):
-        for matcher in self.matchers:
-            _match(matcher, other)
+        for plan in self._plans:
+            plan._match(other)
+
+    def _matches(self, other):
+        return all(plan._matches(other) for plan in self._plans)
+
+
+# types whose hash is consistent with `==` across each other, so set lookups can replace `==`
+_HASHABLE_LITERALS = frozenset([type(None), bool, int, float, str, bytes])
+_NO_TAG = object()
 
 
 class Or(Matcher):
+    """ Value matches any of the alternatives.
+    Alternatives are indexed: plain literals are looked up in a set and dicts having
+    a literal value at a common key (e.g. `{"type": "click", ...}`) by the value at that key.
+    """
+
     def __init__(self, *matchers):
         self.matchers = matchers
+        self._plans = tuple(compile_plan(m) for m in matchers)
+        self._explain_first = _consumes(self._plans)
+
+        literals = [p for p in self._plans if type(p) is _Literal
+                    and type(p.value) in _HASHABLE_LITERALS and p.value == p.value]
+        self._literals = frozenset(p.value for p in literals)
+        indexed = {id(p) for p in literals}
+        rest = [p for p in self._plans if id(p) not in indexed]
+        self._dispatch = _dict_dispatch(rest)
+        if self._dispatch is not None:
+            indexed = {id(p) for p in self._dispatch[2]}
+            rest = [p for p in rest if id(p) not in indexed]
+        self._rest = tuple(rest)
 
     def __or__(self, other):
         return Or(*self.matchers, other)
@@ -187,22 +715,71 @@ class Or(Matcher):
         return '|'.join(repr(it) for it in self.matchers)
 
     def _match(self, other):
-        mismatches = []
-        for matcher in self.matchers:
-            try:
-                _match(matcher, other)
-                return
-            except Mismatch as e:
-                mismatches.append(e)
+        if self._matches(other):
+            return
+
+        raise Mismatch(other, "", lambda: "is not " + " nor ".join(map(short_repr, self.matchers)))
+
+    def _matches(self, other):
+        if self._literals:
+            t = type(other)
+            if t in _HASHABLE_LITERALS:
+                if other in self._literals:
+                    return True
+            elif t not in (dict, list, tuple) and any(v == other for v in self._literals):
+                return True
+
+        # models are dispatched by their dict view too, the plans view them themselves
+        viewed = _viewed(other, dict) if self._dispatch is not None else None
+        if viewed is not None:
+            key, tagged, untagged = self._dispatch
+            tag = viewed.get(key, _NO_TAG)
+            if tag is _NO_TAG:
+                plans = ()  # the key is required by all indexed plans
+            elif type(tag) in _HASHABLE_LITERALS:
+                plans = tagged.get(tag, ())
+            else:
+                plans = untagged
+            if any(plan._matches(other) for plan in plans):
+                return True
+
+        return any(plan._matches(other) for plan in self._rest)
+
+
+def _dict_dispatch(plans):
+    """ Returns (key, {value at key: plans}, all indexed plans) for dict plans sharing a key
+    with literal values, choosing the key covering most plans, or None.
+    """
+
+    by_key = {}
+    for plan in plans:
+        # wrappers like DictContains expose the dict plan they are equivalent to
+        dict_plan = plan if type(plan) is _DictPlan else getattr(plan, "_dict_plan", None)
+        if dict_plan is None:
+            continue
+        for key, value_plan in dict_plan.plans.items():
+            if type(value_plan) is _Literal and type(value_plan.value) in _HASHABLE_LITERALS \
+                    and value_plan.value == value_plan.value:
+                by_key.setdefault(key, []).append((value_plan.value, plan))
+
+    best = max(by_key.items(), key=lambda i: (len(i[1]), len({v for v, _ in i[1]})), default=None)
+    if best is None or len(best[1]) < 2:
+        return None
 
-        or_str = " nor ".join(repr(i) for i in self.matchers)
-        raise Mismatch(other, "", f"is not {or_str}")
+    key, entries = best
+    tagged = {}
+    for value, plan in entries:
+        tagged.setdefault(value, []).append(plan)
+    return key, tagged, [plan for _, plan in entries]
 
 
 class _Any:
     def __repr__(self):
         return "<Any>"
 
+    def __reduce__(self):
+        return "Any"
+
     def __eq__(self, other):
         return other is not Absent
 
@@ -211,6 +788,9 @@ class _Absent:
     def __repr__(self):
         return "<Absent>"
 
+    def __reduce__(self):
+        return "Absent"
+
     def __eq__(self, other):
         return other is self
 
@@ -225,46 +805,107 @@ class MayBe(Matcher):
 
     def __init__(self, v):
         self.v = v
+        self._plan = compile_plan(v)
+        self._explain_first = self._plan._explain_first
+        self._height = self._plan._height
 
     def __repr__(self):
-        return f"MayBe({repr(self.v)})"
+        return f"MayBe({short_repr(self.v)})"
+
+    def _steps(self, other):
+        yield None, self._plan, other
 
     def _match(self, other):
         if self is Absent:
             return
-        _match(self.v, other)
+        self._plan._match(other)
 
+    def _matches(self, other):
+        return self._plan._matches(other)
 
-def _is_missing(val):
-    return not isinstance(val, (MayBe, _Absent))
 
+# memo table of `Shared` nodes for the current top-level match:
+# (id of expectation, id of value) -> (value, passed)
+_memo_table = ContextVar("majava_memo_table", default=None)
 
-def _match_dict(matcher: dict, value: dict, allow_unexpected=False):
-    missing_keys = set(matcher.keys())
-    unexpected_keys = []
 
-    for key, value_v in value.items():
-        try:
-            matcher_v = matcher[key]
-        except KeyError:
-            if not allow_unexpected:
-                unexpected_keys.append(key)
-            continue
+def _with_memo_table(fn, other):
+    token = _memo_table.set({})
+    try:
+        return fn(other)
+    finally:
+        _memo_table.reset(token)
 
-        if matcher_v is Absent:
-            unexpected_keys.append(key)
-            continue
 
-        try:
-            _match(matcher_v, value_v)
-        except Mismatch as e:
-            raise e.prepend(key)
+class Memoized(Matcher):
+    """ Scope of a memo table for `Shared` nodes in the expectation:
+    during one match a shared node is evaluated once per value object.
+    """
+
+    def __init__(self, expected):
+        self.expected = expected
+        self._plan = compile_plan(expected)
+        self._explain_first = self._plan._explain_first
+
+    def __repr__(self):
+        return f"Memoized({short_repr(self.expected)})"
+
+    def _match(self, other):
+        if _memo_table.get() is not None:
+            return self._plan._match(other)
+        return _with_memo_table(self._plan._match, other)
+
+    def _matches(self, other):
+        if _memo_table.get() is not None:
+            return self._plan._matches(other)
+        return _with_memo_table(self._plan._matches, other)
 
-        missing_keys.remove(key)
 
-    missing_keys = sorted(filter(lambda k: _is_missing(matcher[k]), missing_keys))
-    if missing_keys:
-        raise Mismatch.missing_keys(value, missing_keys)
+class Shared(Matcher):
+    """ Expectation used in many places of a bigger one, e.g. an address schema in
+    a dozen of keys or alternatives of `Or`. Results are memoized by the expectation and
+    value identity for the duration of the enclosing `Memoized` (or outermost `Shared`) match.
+    Failures are cached for the fast path only, reports are built as usual.
+    """
 
-    if unexpected_keys:
-        raise Mismatch.unexpected_keys(value, unexpected_keys)
+    def __init__(self, expected):
+        self.expected = expected
+        self._plan = compile_plan(expected)
+        self._explain_first = self._plan._explain_first
+
+    def __repr__(self):
+        return short_repr(self.expected)
+
+    def _match(self, other):
+        table = _memo_table.get()
+        if table is None:
+            return _with_memo_table(self._match, other)
+
+        key = (id(self.expected), id(other))
+        entry = table.get(key)
+        if entry is not None and entry[0] is other and entry[1]:
+            return
+        try:
+            self._plan._match(other)
+        except Mismatch:
+            table[key] = (other, False)
+            raise
+        table[key] = (other, True)
+
+    def _matches(self, other):
+        table = _memo_table.get()
+        if table is None:
+            return _with_memo_table(self._matches, other)
+
+        # the value is kept in the entry, so its id is not reused during the match
+        key = (id(self.expected), id(other))
+        entry = table.get(key)
+        if entry is not None and entry[0] is other:
+            return entry[1]
+        passed = self._plan._matches(other)
+        table[key] = (other, passed)
+        return passed
+
+
+def _is_missing(val):
+    return not isinstance(val, (MayBe, _Absent))
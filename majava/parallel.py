@@ -0,0 +1,88 @@
+""" Matching of big datasets in worker processes.
+"""
+
+from .matchers import Mismatch, compile_plan
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, List, Tuple
+import os
+
+
+# the matcher of a worker process, sent once by the pool initializer
+_worker_plan = None
+
+
+def _init_worker(plan):
+    global _worker_plan
+    _worker_plan = plan
+
+
+def _match_chunk(start, items, first_only, plan=None):
+    """ Returns [(global index, mismatch)] of failed items of a chunk.
+    """
+
+    plan = plan if plan is not None else _worker_plan
+    failures = []
+    for idx, item in enumerate(items, start):
+        if plan._explain_first or not plan._matches(item):
+            mismatch = plan.explain(item)
+            if mismatch is not None:
+                failures.append((idx, mismatch))
+                if first_only:
+                    break
+    return failures
+
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    start = 0
+    while True:
+        items = list(islice(it, size))
+        if not items:
+            return
+        yield start, items
+        start += len(items)
+
+
+def match_many(expected, iterable: Iterable, *, workers=None, chunk_size=10_000,
+               first_only=False) -> List[Tuple[int, Mismatch]]:
+    """ Matches every item of the iterable, returns [(index, Mismatch)] of failed items
+    ordered by index, or only the first one with `first_only`.
+
+    Items are sent to `workers` processes (all CPUs by default) in chunks of `chunk_size`,
+    so the expectation and the items must be picklable. The iterable is consumed lazily,
+    a few chunks per worker at a time. With `workers=0` items are matched in this process.
+    """
+
+    plan = compile_plan(expected)
+    if workers == 0:
+        failures = []
+        for start, items in _chunks(iterable, chunk_size):
+            failures.extend(_match_chunk(start, items, first_only, plan))
+            if failures and first_only:
+                break
+        return failures
+
+    workers = workers or os.cpu_count() or 1
+    failures = []
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(plan,)) as pool:
+        pending = []
+        chunks = _chunks(iterable, chunk_size)
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < 2 * workers:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                pending.append(pool.submit(_match_chunk, *chunk, first_only))
+            if not pending:
+                break
+
+            # results are taken in order, so the first failure found is the first one overall
+            failures.extend(pending.pop(0).result())
+            if failures and first_only:
+                for future in pending:
+                    future.cancel()
+                break
+    return failures
@@ -0,0 +1,183 @@
+""" Matchers waiting for a value to match.
+"""
+
+from .matchers import Matcher, Mismatch, compile_plan
+from .report import short_repr
+from collections.abc import AsyncIterator
+import asyncio
+import inspect
+import time
+
+
+class Backoff:
+    """ Delays between polls: they grow from `interval` by `factor` up to `max_interval`
+    while nothing changes, fall back to `interval` on progress and never pass the deadline.
+    """
+
+    def __init__(self, timeout, interval=0.01, max_interval=1.0, factor=1.5):
+        self.deadline = time.monotonic() + timeout
+        self.interval = interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self._delay = interval
+
+    def remaining(self):
+        return self.deadline - time.monotonic()
+
+    def next_delay(self, progress=False):
+        """ Returns the delay before the next poll or None when the time is out.
+        """
+
+        remaining = self.remaining()
+        if remaining <= 0:
+            return None
+        if progress:
+            self._delay = self.interval
+        delay = min(self._delay, remaining)
+        self._delay = min(self._delay * self.factor, self.max_interval)
+        return delay
+
+
+def _changed(value, prev):
+    if value is prev:
+        return False
+    try:
+        return bool(value != prev)
+    except Exception:
+        return True
+
+
+class Eventually(Matcher):
+    """ Value produced by a source matches within the timeout. The source is polled with
+    adaptive backoff until then and the last mismatch is reported on timeout:
+
+        assert get_status == Eventually({"state": "ready"}, timeout=10)
+        value = await Eventually({"state": "ready"}).wait_async(fetch_status)
+
+    A source is a callable (may return an awaitable), a coroutine function
+    or an async iterator, which is pulled without delays.
+    Asynchronous sources compared synchronously are run in a new event loop,
+    inside a running loop use `wait_async`, e.g. for many conditions with `asyncio.gather`.
+    """
+
+    _explain_first = True
+
+    def __init__(self, expected, timeout=5.0, interval=0.01, *, max_interval=1.0, factor=1.5):
+        self.expected = expected
+        self.timeout = timeout
+        self.interval = interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self._plan = compile_plan(expected)
+
+    def __repr__(self):
+        return f"Eventually({short_repr(self.expected)}, timeout={self.timeout})"
+
+    def _backoff(self):
+        return Backoff(self.timeout, self.interval, self.max_interval, self.factor)
+
+    def _last_mismatch(self, value, reason):
+        try:
+            self._plan._match(value)
+        except Mismatch as e:
+            return Mismatch(e.value, e.path, f"{e.msg} ({reason})")
+        return None
+
+    def _match(self, other):
+        if isinstance(other, AsyncIterator) or inspect.iscoroutinefunction(other):
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return asyncio.run(self._poll_async(other))
+            raise Mismatch(other, "", "asynchronous source in a running event loop - "
+                                      "use `await Eventually(...).wait_async(source)`")
+        if not callable(other):
+            raise Mismatch(other, "", "invalid type - expected a callable, "
+                                      f"coroutine function or async iterator, not {type(other)}")
+        self._poll(other)
+
+    def _poll(self, source):
+        backoff = self._backoff()
+        attempts = 0
+        value = prev = None
+        while True:
+            value = source()
+            if inspect.isawaitable(value):
+                value = asyncio.run(_awaited(value))
+            attempts += 1
+            if self._plan._matches(value):
+                return value
+            delay = backoff.next_delay(attempts > 1 and _changed(value, prev))
+            if delay is None:
+                break
+            prev = value
+            time.sleep(delay)
+
+        mismatch = self._last_mismatch(
+            value, f"still after {attempts} attempt(s) in {self.timeout}s")
+        if mismatch is not None:
+            raise mismatch
+        return value
+
+    async def _poll_async(self, source):
+        backoff = self._backoff()
+        attempts = 0
+        value = prev = None
+        is_iterator = isinstance(source, AsyncIterator)
+        reason = None
+        while True:
+            if is_iterator:
+                try:
+                    value = await asyncio.wait_for(source.__anext__(), max(backoff.remaining(), 0))
+                except StopAsyncIteration:
+                    reason = f"iterator exhausted after {attempts} item(s)"
+                    break
+                except asyncio.TimeoutError:
+                    break
+            else:
+                value = source()
+                if inspect.isawaitable(value):
+                    value = await value
+            attempts += 1
+            if self._plan._matches(value):
+                return value
+
+            delay = backoff.next_delay(attempts > 1 and _changed(value, prev))
+            if delay is None:
+                break
+            prev = value
+            if not is_iterator:
+                await asyncio.sleep(delay)
+
+        if attempts == 0:
+            raise Mismatch(source, "", reason or f"no values produced in {self.timeout}s")
+        mismatch = self._last_mismatch(
+            value, reason or f"still after {attempts} attempt(s) in {self.timeout}s")
+        if mismatch is not None:
+            raise mismatch
+        return value
+
+    def wait(self, source):
+        """ Polls the source until its value matches and returns the value,
+        raises AssertionError with the last mismatch on timeout.
+        """
+
+        try:
+            if isinstance(source, AsyncIterator) or inspect.iscoroutinefunction(source):
+                return asyncio.run(self._poll_async(source))
+            return self._poll(source)
+        except Mismatch as e:
+            raise AssertionError(str(e)) from None
+
+    async def wait_async(self, source):
+        """ Asynchronous `wait`, sleeps without blocking the event loop.
+        """
+
+        try:
+            return await self._poll_async(source)
+        except Mismatch as e:
+            raise AssertionError(str(e)) from None
+
+
+async def _awaited(awaitable):
+    return await awaitable
@@ -0,0 +1,158 @@
+""" Profiler of matchers, used by the pytest plugin with `--majava-profile`.
+"""
+
+from . import matchers
+from .matchers import Matcher
+import functools
+import json
+import sys
+import threading
+import time
+
+
+_METHODS = ("_match", "_matches")
+
+
+class _Stats:
+    __slots__ = ("calls", "cumulative", "self_time")
+
+    def __init__(self):
+        self.calls = 0
+        self.cumulative = 0.0
+        self.self_time = 0.0
+
+
+class Profiler:
+    """ Records calls of `_match` and `_matches` of all matcher classes:
+    call counts, cumulative and self time per matcher type and per expectation site,
+    i.e. the place outside of majava where a top-level match was started.
+    """
+
+    def __init__(self):
+        self.types = {}  # matcher class -> _Stats
+        self.sites = {}  # (test id, file, line) -> _Stats
+        self.current_test = ""
+        self._originals = []  # (class, method name, function)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def install(self):
+        """ Instruments existing matcher classes and ones created later.
+        """
+
+        classes = [Matcher]
+        while classes:
+            cls = classes.pop()
+            self._instrument(cls)
+            classes.extend(cls.__subclasses__())
+        matchers._subclass_hooks.append(self._instrument)
+
+    def uninstall(self):
+        if self._instrument in matchers._subclass_hooks:
+            matchers._subclass_hooks.remove(self._instrument)
+        for cls, name, fn in reversed(self._originals):
+            setattr(cls, name, fn)
+        self._originals.clear()
+
+    def _instrument(self, cls):
+        for name in _METHODS:
+            fn = cls.__dict__.get(name)
+            if fn is None or hasattr(fn, "__majava_profiled__"):
+                continue
+            self._originals.append((cls, name, fn))
+            setattr(cls, name, self._wrap(fn))
+
+    def _wrap(self, fn):
+        timer = time.perf_counter
+
+        @functools.wraps(fn)
+        def wrapper(matcher, other):
+            # frames of active calls: [matcher class, time spent in nested calls]
+            stack = self._stack()
+            cls = type(matcher)
+            frame = [cls, 0.0]
+            stack.append(frame)
+            start = timer()
+            try:
+                return fn(matcher, other)
+            finally:
+                elapsed = timer() - start
+                stack.pop()
+                if stack:
+                    stack[-1][1] += elapsed
+                # recursive calls of a type are counted in its cumulative time once
+                outermost = all(f[0] is not cls for f in stack)
+                site = self._site() if not stack else None
+                with self._lock:
+                    stats = self.types.get(cls)
+                    if stats is None:
+                        stats = self.types[cls] = _Stats()
+                    stats.calls += 1
+                    stats.self_time += elapsed - frame[1]
+                    if outermost:
+                        stats.cumulative += elapsed
+                    if site is not None:
+                        stats = self.sites.get(site)
+                        if stats is None:
+                            stats = self.sites[site] = _Stats()
+                        stats.calls += 1
+                        stats.cumulative += elapsed
+                        stats.self_time += elapsed - frame[1]
+
+        wrapper.__majava_profiled__ = True
+        return wrapper
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _site(self):
+        frame = sys._getframe(2)
+        while frame is not None and frame.f_globals.get("__name__", "").startswith("majava."):
+            frame = frame.f_back
+        if frame is None:
+            return (self.current_test, "", 0)
+        return (self.current_test, frame.f_code.co_filename, frame.f_lineno)
+
+    def report(self, top=20) -> dict:
+        """ Returns stats of `top` types by self time and `top` sites by cumulative time.
+        """
+
+        with self._lock:
+            types = sorted(self.types.items(), key=lambda i: i[1].self_time, reverse=True)
+            sites = sorted(self.sites.items(), key=lambda i: i[1].cumulative, reverse=True)
+            return {
+                "types": [
+                    {"type": f"{cls.__module__}.{cls.__qualname__}", "calls": s.calls,
+                     "cumulative": s.cumulative, "self": s.self_time}
+                    for cls, s in types[:top]
+                ],
+                "sites": [
+                    {"test": test, "file": file, "line": line, "calls": s.calls,
+                     "cumulative": s.cumulative, "self": s.self_time}
+                    for (test, file, line), s in sites[:top]
+                ],
+            }
+
+    def format(self, top=20) -> list:
+        """ Returns lines of the report tables.
+        """
+
+        report = self.report(top)
+        lines = [f"{'calls':>10} {'cumulative':>11} {'self':>11}  matcher type"]
+        lines.extend(
+            f"{i['calls']:>10} {i['cumulative']:>10.4f}s {i['self']:>10.4f}s  {i['type']}"
+            for i in report["types"])
+        lines.append("")
+        lines.append(f"{'calls':>10} {'cumulative':>11} {'self':>11}  expectation site")
+        lines.extend(
+            f"{i['calls']:>10} {i['cumulative']:>10.4f}s {i['self']:>10.4f}s  "
+            f"{i['test'] or i['file']}:{i['line']}"
+            for i in report["sites"])
+        return lines
+
+    def dump(self, path, top=None):
+        with open(path, "w") as f:
+            json.dump(self.report(top if top is not None else sys.maxsize), f, indent=2)
@@ -1,14 +1,105 @@
 import pytest
-from .matchers import Matcher
+from .matchers import Matcher, last_mismatch
+from .profile import Profiler
+from .report import short_repr, structural_diff
+from . import snapshot
+import os
+
+
+_profiler_key = pytest.StashKey[Profiler]()
+
+
+def pytest_addoption(parser: pytest.Parser):
+    group = parser.getgroup("majava")
+    group.addoption(
+        "--majava-profile", action="store_true",
+        help="profile matchers and report the slowest matcher types and expectation sites")
+    group.addoption(
+        "--majava-profile-top", type=int, default=20, metavar="N",
+        help="number of rows in the matcher profile tables (default: 20)")
+    group.addoption(
+        "--majava-profile-json", metavar="PATH",
+        help="also write the full matcher profile to a JSON file")
+    group.addoption(
+        "--majava-update-snapshots", action="store_true",
+        help="re-record snapshots which do not match")
+    group.addoption(
+        "--majava-snapshot-db", metavar="PATH",
+        help=f"snapshot database (default: {snapshot.DEFAULT_PATH} in the rootdir)")
+
+
+def pytest_configure(config: pytest.Config):
+    if config.getoption("majava_profile", False):
+        profiler = Profiler()
+        profiler.install()
+        config.stash[_profiler_key] = profiler
+
+    path = config.getoption("majava_snapshot_db", None) \
+        or os.path.join(config.rootpath, snapshot.DEFAULT_PATH)
+    snapshot.session = snapshot.SnapshotSession(
+        snapshot.SnapshotStore(path), update=config.getoption("majava_update_snapshots", False))
+
+
+def pytest_unconfigure(config: pytest.Config):
+    profiler = config.stash.get(_profiler_key, None)
+    if profiler is not None:
+        profiler.uninstall()
+
+    if snapshot.session is not None:
+        snapshot.session.store.close()
+        snapshot.session = None
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_protocol(item: pytest.Item):
+    session = snapshot.session
+    if session is not None:
+        session.test = item.nodeid
+    try:
+        return (yield)
+    finally:
+        if session is not None:
+            session.test = None
+            session.store.flush()
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item: pytest.Item):
+    profiler = item.config.stash.get(_profiler_key, None)
+    if profiler is not None:
+        profiler.current_test = item.nodeid
+    try:
+        return (yield)
+    finally:
+        if profiler is not None:
+            profiler.current_test = ""
+
+
+def pytest_terminal_summary(terminalreporter, config: pytest.Config):
+    profiler = config.stash.get(_profiler_key, None)
+    if profiler is None:
+        return
+
+    terminalreporter.write_sep("-", "majava profile")
+    for line in profiler.format(config.getoption("majava_profile_top")):
+        terminalreporter.write_line(line)
+
+    path = config.getoption("majava_profile_json")
+    if path:
+        profiler.dump(path)
+        terminalreporter.write_line(f"majava profile written to {path}")
 
 
 def pytest_assertrepr_compare(config: pytest.Config, op, left, right):
     if not (isinstance(left, Matcher) or isinstance(right, Matcher)):
         return
 
-    matcher = left if isinstance(left, Matcher) else right
+    matcher, value = (left, right) if isinstance(left, Matcher) else (right, left)
+    mismatch = last_mismatch(matcher, value)
 
-    return [
-        f"{left} {op} {right}",
-        f"{matcher._mismatch}",
-    ]
+    lines = [f"{short_repr(left)} {op} {short_repr(right)}"]
+    # pytest truncates explanations below -vv, the mismatch line must stay the last one
+    if config is not None and config.getoption("verbose") >= 2 and mismatch and mismatch.path:
+        lines.extend(structural_diff(value, mismatch))
+    lines.append(f"{mismatch}")
+    return lines
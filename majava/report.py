@@ -0,0 +1,223 @@
+""" Size-bounded rendering of values for mismatch reports.
+"""
+
+from collections import defaultdict
+from itertools import islice
+import dataclasses
+import reprlib
+
+
+MAX_ITEMS = 32
+MAX_CHARS = 4000
+
+
+class _BoundedRepr(reprlib.Repr):
+    """ `repr` with limits on depth, items per container and total length.
+    Builtin containers within the limits are rendered exactly as `repr` does,
+    so unlike `reprlib` dicts and sets are not sorted. Subclasses of builtin containers,
+    namedtuples and dataclasses are rendered item by item too, in the `Name(...)` form.
+    Other objects are rendered by their own `repr`, which is then truncated.
+    """
+
+    _containers = frozenset(["tuple", "list", "dict", "set", "frozenset", "deque", "array"])
+
+    def __init__(self, max_items=MAX_ITEMS, max_chars=MAX_CHARS):
+        super().__init__()
+        self.maxlevel = 8
+        self.maxtuple = self.maxlist = self.maxdict = self.maxarray = max_items
+        self.maxset = self.maxfrozenset = self.maxdeque = max_items
+        self.maxstring = self.maxlong = self.maxother = max_chars // 4
+        self.budget = max_chars
+
+    def repr1(self, x, level):
+        if self.budget <= 0:
+            return self.fillvalue
+
+        typename = type(x).__name__
+        if typename not in self._containers and not hasattr(self, "repr_" + typename):
+            s = self._repr_composite(x, level)
+            if s is not None:
+                return s
+
+        s = super().repr1(x, level)
+        if typename not in self._containers:
+            self.budget -= len(s)
+        return s
+
+    def _repr_composite(self, x, level):
+        """ Renders subclasses of builtin containers (OrderedDict, defaultdict, ...),
+        namedtuples and dataclasses without calling their `repr`, or returns None.
+        """
+
+        cls = type(x)
+        name = cls.__name__
+        if isinstance(x, tuple) and hasattr(cls, "_fields"):
+            return self._repr_fields(name, zip(cls._fields, x), level)
+        if dataclasses.is_dataclass(cls) and cls.__dataclass_params__.repr:
+            return self._repr_fields(name, (
+                (f.name, getattr(x, f.name)) for f in dataclasses.fields(cls) if f.repr), level)
+        if isinstance(x, dict):
+            if isinstance(x, defaultdict):
+                factory = self.repr1(x.default_factory, level - 1)
+                return f"{name}({factory}, {self.repr_dict(x, level)})"
+            return f"{name}({self.repr_dict(x, level)})"
+        for base in (list, tuple, set, frozenset):
+            if isinstance(x, base):
+                return f"{name}({getattr(self, 'repr_' + base.__name__)(x, level)})"
+        return None
+
+    def _repr_fields(self, name, fields, level):
+        if level <= 0:
+            return f"{name}({self.fillvalue})"
+        pieces = []
+        for key, value in fields:
+            if len(pieces) == self.maxtuple:
+                pieces.append(self.fillvalue)
+                break
+            pieces.append(f"{key}={self.repr1(value, level - 1)}")
+        return f"{name}({', '.join(pieces)})"
+
+    def repr_mappingproxy(self, x, level):
+        return f"mappingproxy({self.repr_dict(x, level)})"
+
+    def _repr_iterable(self, x, level, left, right, maxiter, trail=''):
+        if level > 0 and len(x) > maxiter:
+            x = list(islice(x, maxiter + 1))  # avoid copying big sets
+        return super()._repr_iterable(x, level, left, right, maxiter, trail)
+
+    def repr_set(self, x, level):
+        if not x:
+            return "set()"
+        return self._repr_iterable(x, level, "{", "}", self.maxset)
+
+    def repr_frozenset(self, x, level):
+        if not x:
+            return "frozenset()"
+        return self._repr_iterable(x, level, "frozenset({", "})", self.maxfrozenset)
+
+    def repr_dict(self, x, level):
+        if not x:
+            return "{}"
+        if level <= 0:
+            return "{" + self.fillvalue + "}"
+        pieces = [f"{self.repr1(k, level - 1)}: {self.repr1(v, level - 1)}"
+                  for k, v in islice(x.items(), self.maxdict)]
+        if len(x) > self.maxdict:
+            pieces.append(self.fillvalue)
+        return "{" + ", ".join(pieces) + "}"
+
+    def repr_bytes(self, x, level):
+        s = repr(x[:self.maxstring])
+        if len(x) > self.maxstring:
+            s = f"{s[:-1]}{self.fillvalue}{s[-1]}"
+        return s
+
+    def repr_bytearray(self, x, level):
+        return f"bytearray({self.repr_bytes(bytes(x[:self.maxstring + 1]), level)})"
+
+
+def short_repr(value, max_items=MAX_ITEMS, max_chars=MAX_CHARS) -> str:
+    """ Returns `repr(value)` for small values and an abbreviated one for big values.
+    For containers, namedtuples and dataclasses the cost depends on the limits,
+    not on the size of the value, other objects are rendered by their `repr`.
+    """
+
+    return _BoundedRepr(max_items, max_chars).repr(value)
+
+
+def items_repr(items, limit=MAX_ITEMS) -> str:
+    """ Returns comma separated reprs of at most `limit` items.
+    """
+
+    items = list(islice(items, limit + 1))
+    more = [reprlib.aRepr.fillvalue] if len(items) > limit else []
+    return ", ".join([short_repr(i) for i in items[:limit]] + more)
+
+
+def _step(node, segments):
+    """ Resolves the first path segment(s) in the node.
+    Returns (child, key, number of consumed segments) or None.
+    """
+
+    if isinstance(node, dict):
+        # keys may contain dots, so longest joined segments are tried first
+        for n in range(len(segments), 0, -1):
+            key = ".".join(segments[:n])
+            if key in node:
+                return node[key], key, n
+        for key in node:
+            if not isinstance(key, str) and str(key) == segments[0]:
+                return node[key], key, 1
+        return None
+
+    if isinstance(node, (list, tuple)):
+        seg = segments[0]
+        if seg.isdigit() and int(seg) < len(node):
+            return node[int(seg)], int(seg), 1
+        return None
+
+    if not isinstance(node, (str, bytes)) and hasattr(node, segments[0]):
+        return getattr(node, segments[0]), segments[0], 1
+    return None
+
+
+def _neighbours(node, key):
+    """ Returns the index of the key and keys of items adjacent to it (if any).
+    """
+
+    if not isinstance(node, dict):
+        return key, range(max(key - 1, 0), key), range(key + 1, min(key + 2, len(node)))
+
+    it = iter(node)
+    prev = ()
+    for idx, k in enumerate(it):
+        if k == key:
+            return idx, prev, tuple(islice(it, 1))
+        prev = (k,)
+
+
+def _render(node, segments, marker, indent, lines, head, trail=""):
+    pad = "    " * indent
+    step = _step(node, segments) if segments else None
+    if step is None:
+        rest = ".".join(segments)
+        at = f"at {rest!r}: " if rest else ""
+        lines.append(f"{pad}{head}{short_repr(node, 8, 200)}{trail}  <- {at}{marker}")
+        return
+
+    child, key, consumed = step
+    if not isinstance(node, (dict, list, tuple)):
+        lines.append(f"{pad}{head}{type(node).__name__}(")
+        _render(child, segments[consumed:], marker, indent + 1, lines, f"{key}=", ",")
+        lines.append(f"{pad}){trail}")
+        return
+
+    is_dict = isinstance(node, dict)
+    left, right = ("{", "}") if is_dict else (("[", "]") if isinstance(node, list) else ("(", ")"))
+    idx, before, after = _neighbours(node, key)
+
+    def item(k):
+        value = short_repr(node[k], 8, 120)
+        return f"{pad}    {short_repr(k, 8, 120)}: {value}," if is_dict else f"{pad}    {value},"
+
+    lines.append(f"{pad}{head}{left}")
+    if idx > 1:
+        lines.append(f"{pad}    ... {idx - 1} item(s)")
+    lines.extend(item(k) for k in before)
+    _render(child, segments[consumed:], marker, indent + 1, lines,
+            f"{short_repr(key, 8, 120)}: " if is_dict else "", ",")
+    lines.extend(item(k) for k in after)
+    if len(node) - idx > 2:
+        lines.append(f"{pad}    ... {len(node) - idx - 2} item(s)")
+    lines.append(f"{pad}{right}{trail}")
+
+
+def structural_diff(root, mismatch) -> list:
+    """ Renders the neighbourhood of the mismatch path in the root value:
+    containers along the path with their items adjacent to it, other items are summarized.
+    """
+
+    lines = []
+    segments = mismatch.path.split(".") if mismatch.path else []
+    _render(root, segments, mismatch.msg, 0, lines, "")
+    return lines
@@ -0,0 +1,316 @@
+""" Snapshot matchers: `value == Snapshot()` records the value on the first run
+(or with `--majava-update-snapshots`) and compares with the recorded one later.
+
+Snapshots are kept in one SQLite database (`.majava-snapshots.db` in the rootdir by default):
+entries are indexed by test id and name and refer to zlib-compressed texts by content hash,
+so equal snapshots are stored once. A snapshot is the text of an expectation tree,
+which may be edited to contain matchers, e.g.
+
+    {'id': Any, 'price': Round(9.99, 2), 'note': MayBe(IsInstance(str))}
+
+Snapshots are inspected and edited with:
+
+    python -m majava.snapshot list [PATTERN]
+    python -m majava.snapshot show TEST NAME
+    python -m majava.snapshot edit TEST NAME
+"""
+
+from .matchers import Matcher, Mismatch, Any, Absent, MayBe, compile_plan
+from .basic import IsInstance, DictContains, Round, Contains, Unordered, StartsWith, EndsWith, \
+    LengthIs, InInterval, EachIs, Regexp, FullMatch, Search
+import argparse
+import ast
+import hashlib
+import os
+import pprint
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import zlib
+
+
+DEFAULT_PATH = ".majava-snapshots.db"
+
+# names allowed in snapshot texts
+_NAMES = {
+    "Any": Any, "Absent": Absent, "nan": float("nan"), "inf": float("inf"),
+    "int": int, "float": float, "str": str, "bytes": bytes, "bool": bool,
+    "list": list, "tuple": tuple, "dict": dict, "set": set, "NoneType": type(None),
+}
+_CALLABLES = {
+    m.__name__: m for m in (
+        MayBe, IsInstance, DictContains, Round, Contains, Unordered, StartsWith, EndsWith,
+        LengthIs, InInterval, EachIs, Regexp, FullMatch, Search, set, frozenset)
+}
+_PLAIN_TYPES = (type(None), bool, int, float, str, bytes)
+
+
+def dump(value) -> str:
+    """ Returns the snapshot text of the value, raises TypeError for unsupported types.
+    """
+
+    _check_dumpable(value)
+    return pprint.pformat(value, width=100, sort_dicts=False)
+
+
+def _check_dumpable(value):
+    stack = [value]
+    while stack:
+        v = stack.pop()
+        t = type(v)
+        if t in _PLAIN_TYPES:
+            continue
+        if t is dict:
+            stack.extend(v.keys())
+            stack.extend(v.values())
+        elif t in (list, tuple, set, frozenset):
+            stack.extend(v)
+        else:
+            raise TypeError(f"values of type {t.__name__} can't be snapshotted")
+
+
+def load(text: str):
+    """ Returns the expectation tree of a snapshot text.
+    Only literals, `_NAMES` and calls of `_CALLABLES` are allowed, nothing is executed.
+    """
+
+    return _build(ast.parse(text.strip(), mode="eval").body)
+
+
+def _build(node):
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        value = _build(node.operand)
+        if type(value) in (int, float):
+            return -value if isinstance(node.op, ast.USub) else value
+    if isinstance(node, ast.Dict) and None not in node.keys:
+        return {_build(k): _build(v) for k, v in zip(node.keys, node.values)}
+    if isinstance(node, ast.List):
+        return [_build(i) for i in node.elts]
+    if isinstance(node, ast.Tuple):
+        return tuple(_build(i) for i in node.elts)
+    if isinstance(node, ast.Set):
+        return {_build(i) for i in node.elts}
+    if isinstance(node, ast.Name) and node.id in _NAMES:
+        return _NAMES[node.id]
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) \
+            and node.func.id in _CALLABLES:
+        args = [_build(i) for i in node.args]
+        kwargs = {k.arg: _build(k.value) for k in node.keywords if k.arg is not None}
+        if len(kwargs) == len(node.keywords):
+            return _CALLABLES[node.func.id](*args, **kwargs)
+    raise ValueError(f"unsupported expression in snapshot at line {node.lineno}: "
+                     f"{ast.unparse(node)}")
+
+
+def _hash(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class SnapshotStore:
+    """ Snapshots in an SQLite database. The database is opened on first use,
+    entries of a test are loaded when the test asks for one of them
+    and only changed entries are written.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = None
+        self._tests = {}  # test id -> {name: hash}
+        self._lock = threading.RLock()
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS texts (hash TEXT PRIMARY KEY, data BLOB NOT NULL);
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    test TEXT NOT NULL, name TEXT NOT NULL, hash TEXT NOT NULL,
+                    PRIMARY KEY (test, name)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS snapshots_hash ON snapshots (hash);
+            """)
+        return self._db
+
+    def entries(self, test) -> dict:
+        """ Returns {name: hash} of snapshots of the test.
+        """
+
+        with self._lock:
+            entries = self._tests.get(test)
+            if entries is None:
+                if self._db is None and not os.path.exists(self.path):
+                    entries = {}
+                else:
+                    rows = self._connect().execute(
+                        "SELECT name, hash FROM snapshots WHERE test = ?", (test,))
+                    entries = dict(rows)
+                self._tests[test] = entries
+            return entries
+
+    def text(self, hash_) -> str:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT data FROM texts WHERE hash = ?", (hash_,)).fetchone()
+        if row is None:
+            raise KeyError(f"no snapshot text with hash {hash_}")
+        return zlib.decompress(row[0]).decode()
+
+    def put(self, test, name, text) -> str:
+        """ Stores the snapshot, it is committed on `flush`.
+        """
+
+        hash_ = _hash(text)
+        with self._lock:
+            db = self._connect()
+            db.execute("INSERT OR IGNORE INTO texts VALUES (?, ?)",
+                       (hash_, zlib.compress(text.encode())))
+            db.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)", (test, name, hash_))
+            self.entries(test)[name] = hash_
+        return hash_
+
+    def list(self, pattern=""):
+        """ Returns (test, name, hash, size) of snapshots with the pattern in the test id.
+        """
+
+        with self._lock:
+            return self._connect().execute(
+                "SELECT test, name, snapshots.hash, length(data) FROM snapshots "
+                "JOIN texts USING (hash) WHERE instr(test, ?) ORDER BY test, name",
+                (pattern,)).fetchall()
+
+    def flush(self):
+        with self._lock:
+            if self._db is not None and self._db.in_transaction:
+                self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.execute(
+                    "DELETE FROM texts WHERE hash NOT IN (SELECT hash FROM snapshots)")
+                self._db.commit()
+                self._db.close()
+                self._db = None
+            self._tests.clear()
+
+
+class SnapshotSession:
+    """ Snapshot settings of a test session and the test being run.
+    """
+
+    def __init__(self, store: SnapshotStore, update=False):
+        self.store = store
+        self.update = update
+        self.test = None
+        self._counters = {}
+
+    def next_name(self, test):
+        with self.store._lock:
+            count = self._counters.get(test, 0)
+            self._counters[test] = count + 1
+        return str(count)
+
+
+# set by the pytest plugin
+session = None
+
+
+class Snapshot(Matcher):
+    """ Value matches the snapshot recorded for this test, the name defaults to
+    the number of the snapshot within the test. The first comparison records the value.
+    """
+
+    def __init__(self, name=None):
+        if session is None or session.test is None:
+            raise RuntimeError("Snapshot() may be used only in tests run by pytest "
+                               "with the majava plugin")
+        self._session = session
+        self.test = session.test
+        self.name = name if name is not None else session.next_name(self.test)
+        self._loaded = None  # (hash, compiled expectation)
+
+    def __repr__(self):
+        return f"Snapshot({self.test}::{self.name})"
+
+    def _expectation(self, hash_):
+        loaded = self._loaded
+        if loaded is None or loaded[0] != hash_:
+            text = self._session.store.text(hash_)
+            try:
+                loaded = self._loaded = (hash_, compile_plan(load(text)))
+            except (ValueError, SyntaxError) as e:
+                raise Mismatch(text, "", f"invalid snapshot {self} - {e}") from e
+        return loaded[1]
+
+    def _match(self, other):
+        try:
+            text = dump(other)
+        except TypeError as e:
+            raise Mismatch(other, "", str(e)) from e
+
+        store = self._session.store
+        stored = store.entries(self.test).get(self.name)
+        if stored is None:
+            store.put(self.test, self.name, text)
+            return
+        if stored == _hash(text):
+            return
+
+        try:
+            self._expectation(stored)._match(other)
+        except Mismatch:
+            if not self._session.update:
+                raise
+            store.put(self.test, self.name, text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m majava.snapshot",
+                                     description="Inspects and edits majava snapshots.")
+    parser.add_argument("-d", "--db", default=DEFAULT_PATH, help="snapshot database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    list_parser = commands.add_parser("list", help="list snapshots")
+    list_parser.add_argument("pattern", nargs="?", default="", help="substring of test ids")
+    for command in ("show", "edit"):
+        sub = commands.add_parser(command, help=f"{command} a snapshot")
+        sub.add_argument("test")
+        sub.add_argument("name")
+    args = parser.parse_args(argv)
+
+    store = SnapshotStore(args.db)
+    try:
+        if args.command == "list":
+            for test, name, hash_, size in store.list(args.pattern):
+                print(f"{test}  {name}  {hash_[:12]}  {size}")
+            return 0
+
+        hash_ = store.entries(args.test).get(args.name)
+        if hash_ is None:
+            print(f"no snapshot {args.name!r} of {args.test}", file=sys.stderr)
+            return 1
+        text = store.text(hash_)
+        if args.command == "show":
+            print(text)
+            return 0
+
+        with tempfile.NamedTemporaryFile("w+", suffix=".py") as f:
+            f.write(text)
+            f.flush()
+            subprocess.run([os.environ.get("EDITOR", "vi"), f.name], check=True)
+            f.seek(0)
+            new_text = f.read()
+        load(new_text)  # validate
+        if new_text != text:
+            store.put(args.test, args.name, new_text)
+            store.flush()
+        return 0
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+import pytest
+from majava import DictContains
+from .common import raises_assertion_error
+
+np = pytest.importorskip("numpy")
+from majava.arrays import ArrayClose, ArrayInInterval, ArrayRound, DtypeIs, ShapeIs, \
+    Columns  # noqa: E402
+
+
+def test_array_close():
+    m = ArrayClose([1.0, 2.0, 3.0], atol=0.01)
+
+    assert np.array([1.0, 2.001, 3.0]) == m
+    assert [1, 2, 3] == m
+    with raises_assertion_error(
+        "Value array([1. , 2.5, 3. ]) does not match: "
+        "1 of 3 items are not close to expected (rtol=1e-05, atol=0.01): [1]=np.float64(2.5)"
+    ):
+        assert np.array([1.0, 2.5, 3.0]) == m
+    with raises_assertion_error(
+        "Value array([1., 2.]) does not match: invalid shape - got (2,), expected (3,)"
+    ):
+        assert np.array([1.0, 2.0]) == m
+
+
+def test_array_close__reports_first_indices():
+    value = np.zeros(1_000_000)
+    value[10::100_000] = 1.0
+
+    assert not ArrayClose(np.zeros(1_000_000)).matches(value)
+    reason = str(ArrayClose(np.zeros(1_000_000), limit=2).explain(value))
+    assert reason.endswith(
+        "10 of 1000000 items are not close to expected (rtol=1e-05, atol=1e-08): "
+        "[10]=np.float64(1.0), [100010]=np.float64(1.0), ..."
+    )
+
+
+def test_array_in_interval__2d():
+    m = ArrayInInterval(0, 1)
+
+    assert np.array([[0, 0.5], [1, 0.2]]) == m
+    assert str(m.explain(np.array([[0, 2], [-1, 0.2]]))).endswith(
+        "does not match: "
+        "2 of 4 items are not in [0, 1]: [(0, 1)]=np.float64(2.0), [(1, 0)]=np.float64(-1.0)"
+    )
+
+
+def test_array_round():
+    m = ArrayRound(3.14159, 2)
+
+    assert repr(m) == "ArrayRound(np.float64(3.14))"
+    assert np.full(10, 3.141) == m
+    assert not m.matches(np.array([3.14, 3.15]))
+    assert not m.matches(["a", "b"])
+
+
+def test_dtype_and_shape():
+    arr = np.zeros((3, 4), dtype=np.float32)
+
+    assert arr == DtypeIs(np.floating)
+    assert arr == DtypeIs(np.float32)
+    assert arr == ShapeIs(3, None)
+    assert not DtypeIs(np.integer).matches(arr)
+    assert not ShapeIs(3).matches(arr)
+    with raises_assertion_error(
+        "Value [1, 2] does not match: invalid shape - got None, expected (2,)"
+    ):
+        assert [1, 2] == ShapeIs(2)
+
+
+def test_columns():
+    records = np.array([(1, 0.5), (2, 0.7)], dtype=[("id", "i8"), ("value", "f8")])
+    m = Columns(id=DtypeIs(np.integer), value=ArrayInInterval(0, 1))
+
+    assert records == m
+    assert {"data": records} == DictContains({"data": m})
+    with raises_assertion_error(
+        "Value array([0.5, 0.7]) at 'value' does not match: "
+        "2 of 2 items are not in [0.6, 0.6]: [0]=np.float64(0.5), [1]=np.float64(0.7)"
+    ):
+        assert records == Columns(value=ArrayInInterval(0.6, 0.6))
+    with raises_assertion_error():
+        assert records == Columns(missing=DtypeIs(np.integer))
@@ -1,5 +1,7 @@
+import itertools
 from majava import InInterval, IsInstance, Round, StartsWith, EndsWith, LengthIs, HasAttrs, \
-    Any, Absent
+    EachIs, Any, Absent, Regexp, FullMatch, Search
+import pytest
 from .common import raises_assertion_error
 
 
@@ -66,6 +68,17 @@ def test_length_is():
         assert "abcd" == m
 
 
+def test_length_is__iterator():
+    m = LengthIs(3)
+
+    assert (i for i in range(3)) == m
+    assert not m.matches(iter([1, 2]))
+
+    endless = itertools.count()
+    assert not (endless == m)
+    assert next(endless) == 4  # stopped right after the 4th item
+
+
 def test_has_attrs():
     class AttrDict(dict):
         def __getattr__(self, key):
@@ -85,3 +98,74 @@ def test_has_attrs():
         assert AttrDict({"a": 1}) == m
     with raises_assertion_error("Value 3 at 'c' does not match: unexpected item"):
         assert AttrDict({"a": 1, "b": 2, "c": 3}) == m
+
+
+def test_each_is():
+    m = EachIs(InInterval(1, 3))
+
+    assert repr(m) == "EachIs(InInterval(1, 3))"
+    assert [1, 2, 3] == m
+    assert [] == m
+    assert (i % 3 + 1 for i in range(1000)) == m
+    with raises_assertion_error("Value 4 at '2' does not match: not InInterval(1, 3)"):
+        assert [1, 3, 4, 0] == m
+    with raises_assertion_error(
+        "Value 1 does not match: not iterable - 'int' object is not iterable"
+    ):
+        assert 1 == m
+
+
+def test_each_is__early_exit():
+    items = itertools.count()
+    with raises_assertion_error("Value 2 at '1.a' does not match: 2 != 1"):
+        assert ({"a": i * 2 + 1 if i == 0 else 2} for i in items) == EachIs({"a": 1})
+    assert next(items) == 2
+
+
+def test_regexp():
+    assert repr(Regexp(r"\d+")) == "Regexp('\\\\d+')"
+    assert "12ab" == Regexp(r"\d+")
+    assert b"12ab" == Regexp(r"\d+")
+    assert memoryview(b"12ab") == Regexp(rb"\d+")
+    assert "12" == Regexp(rb"\d+")
+    assert "ab12" == Search(r"\d+")
+    assert "12" == FullMatch(r"\d+")
+    assert Regexp(r"\d+")._regex is Search(r"\d+")._regex  # shared compiled pattern
+
+    with raises_assertion_error("Value 'ab12' does not match: not Regexp('\\\\d+')"):
+        assert "ab12" == Regexp(r"\d+")
+    with raises_assertion_error("Value '12ab' does not match: not FullMatch('\\\\d+')"):
+        assert "12ab" == FullMatch(r"\d+")
+    with raises_assertion_error("Value 12 does not match: not Search('\\\\d+') "
+                                "(invalid type - expected str, bytes or memoryview, not int)"):
+        assert 12 == Search(r"\d+")
+
+
+def test_regexp__groups():
+    m = Search(r"id=(?P<n>\d+)", convert=int, n=InInterval(1, 10))
+    assert "id=5" == m
+    assert [b"id=7", "x id=10"] == [m, m]
+    with raises_assertion_error("Value 11 at 'n' does not match: not InInterval(1, 10)"):
+        assert "id=11" == m
+
+    assert "a" == Regexp(r"(?P<a>a)(?P<b>b)?", b=None)
+    with pytest.raises(ValueError):
+        Regexp(r"(?P<a>a)", b=1)
+
+
+def test_regexp__group_errors():
+    m = Regexp(r"(?P<n>\d+)", n=InInterval(1, 10))
+    assert not m.matches("5")
+    with raises_assertion_error(
+            "Value '5' at 'n' does not match: not InInterval(1, 10) ('<=' not supported "
+            "between instances of 'int' and 'str') - the group is str, "
+            "use `convert` to check it as a number"):
+        assert "5" == m
+    assert "5" == Regexp(r"(?P<n>\d+)", n="5")
+
+    m = Regexp(r"(?P<n>\w+)", convert=int, n=1)
+    assert not m.matches("x")
+    with raises_assertion_error(
+            "Value 'x' at 'n' does not match: can't convert "
+            "(invalid literal for int() with base 10: 'x')"):
+        assert "x" == m
@@ -0,0 +1,26 @@
+from benchmarks.__main__ import main, compare
+import json
+
+
+def test_compare():
+    baseline = {"a": {"min": 1.0}, "b": {"min": 1.0}}
+    lines, regressions = compare(
+        {"a": {"min": 1.05}, "b": {"min": 1.5}, "c": {"min": 1.0}}, baseline, threshold=0.1)
+    assert regressions == ["b"]
+    assert len(lines) == 4
+    assert lines[2].endswith("SLOWER")
+    assert lines[3].split()[-1] == "new"
+
+
+def test_cli(tmp_path, capsys):
+    results = tmp_path / "results.json"
+    args = ["-k", "or_chain[alternatives=10,", "--repeat", "1", "--min-time", "0.001"]
+    assert main(args + ["-o", str(results)]) == 0
+    data = json.loads(results.read_text())
+    assert list(data["results"]) == ["or_chain[alternatives=10,kind=literal]"]
+
+    # a baseline 1000 times faster makes it a regression
+    data["results"]["or_chain[alternatives=10,kind=literal]"]["min"] /= 1000
+    results.write_text(json.dumps(data))
+    assert main(args + ["--baseline", str(results)]) == 1
+    assert "1 case(s) slower than the baseline" in capsys.readouterr().out
@@ -1,5 +1,5 @@
 import pytest
-from majava import DictContains, Absent, Contains, Unordered
+from majava import DictContains, Absent, Any, Contains, Unordered, IsInstance, InInterval
 from .common import raises_assertion_error
 
 
@@ -56,8 +56,45 @@ def test_contains_ordered__list():
 
     assert repr(m) == "ContainsOrdered([2, 4])"
     assert [1, 2, 3, 4] == m
-    with raises_assertion_error("Value [4, 3, 2] does not match: 4 is not in order"):
+    with raises_assertion_error(
+        "Value [4, 3, 2] does not match: 4 is not in order - not found after index 2"
+    ):
         assert [4, 3, 2] == m
+    with raises_assertion_error("Value [1, 3] does not match: 2 is not found"):
+        assert [1, 3] == m
+
+
+def test_contains_ordered__repeated():
+    m = Contains([1, 2, 1], ordered=True)
+
+    assert [1, 2, 1] == m
+    assert [0, 1, 1, 2, 0, 1] == m
+    with raises_assertion_error(
+        "Value [1, 2, 2] does not match: 1 is not in order - not found after index 1"
+    ):
+        assert [1, 2, 2] == m
+
+
+def test_contains_ordered__iterable():
+    class Lines:
+        def __init__(self, *lines):
+            self.lines = lines
+
+        def __iter__(self):
+            yield from self.lines
+
+        def __repr__(self):
+            return "<Lines>"
+
+    m = Contains([IsInstance(str), 3, DictContains({"a": 1})], ordered=True)
+
+    assert iter([0, "x", 1, 3, {"a": 1, "b": 2}]) == m
+    assert (i for i in ["a", 3, {"a": 1}]) == m
+    with raises_assertion_error(
+        "Value <Lines> does not match: "
+        "DictContains({'a': 1}) is not in order - not found after index 1"
+    ):
+        assert Lines("a", 3, 4, 5) == m
 
 
 def test_contains__str():
@@ -75,7 +112,10 @@ def test_contains_ordered__str():
 
     assert repr(m) == "ContainsOrdered(['ab', 'cd'])"
     assert "_ab cd_" == m
-    with raises_assertion_error("Value '_cd ab_' does not match: 'cd' is not in order"):
+    assert "abcd" == m
+    with raises_assertion_error(
+        "Value '_cd ab_' does not match: 'cd' is not in order - not found after index 4"
+    ):
         assert "_cd ab_" == m
 
 
@@ -90,5 +130,97 @@ def test_unordered__list():
 
     with raises_assertion_error("Value [1, 2, 3, 4] does not match: len is not 3"):
         assert [1, 2, 3, 4] == m
-    with raises_assertion_error("Value [1, 2, 4] does not match: missing items: 3"):
+    with raises_assertion_error(
+        "Value [1, 2, 4] does not match: missing items: 3; unexpected items: 4"
+    ):
         assert [1, 2, 4] == m
+
+
+def test_unordered__duplicates():
+    m = Unordered([1, 1, 2])
+
+    assert [1, 2, 1] == m
+    with raises_assertion_error(
+        "Value [1, 2, 2] does not match: missing items: 1; unexpected items: 2"
+    ):
+        assert [1, 2, 2] == m
+
+
+def test_unordered__matchers():
+    m = Unordered([IsInstance(int), 1, {"a": 1}, DictContains({"b": Any})])
+
+    assert [{"b": 2, "c": 3}, 1, True, {"a": 1}] == m
+    assert [2, {"a": 1}, 1, {"b": None}] == m
+    with raises_assertion_error(
+        "Value ['x', 1, {'a': 1}, {'b': 2}] does not match: "
+        "missing items: IsInstance(int); unexpected items: 'x'"
+    ):
+        assert ["x", 1, {"a": 1}, {"b": 2}] == m
+
+
+def test_unordered__greedy_literal():
+    # the literal 1 must be paired with 1.0 to leave the int for IsInstance
+    assert [1, 1.0] == Unordered([1, IsInstance(int)])
+    assert [1.0, 1] == Unordered([IsInstance(int), 1])
+
+
+def test_unordered__large():
+    expected = [{"id": i, "tags": [i % 3]} for i in range(10_000)]
+    actual = list(reversed(expected))
+
+    assert actual == Unordered(expected)
+
+    actual[0] = {"id": -1, "tags": []}
+    with raises_assertion_error():
+        assert actual == Unordered(expected)
+
+    with raises_assertion_error(
+        "Value [{'id': -1}, {'id': 0}] does not match: "
+        "missing items: {'id': 1}; unexpected items: {'id': -1}"
+    ):
+        assert [{"id": -1}, {"id": 0}] == Unordered([{"id": 0}, {"id": 1}])
+
+
+def test_unordered__indexed_matchers():
+    expected = [DictContains({"id": i, "v": IsInstance(int)}) for i in range(20_000)]
+    actual = [{"id": i, "v": i, "x": None} for i in reversed(range(20_000))]
+    assert actual == Unordered(expected)
+
+    actual[0] = {"id": 19_999, "v": "x"}
+    with raises_assertion_error(
+        "Value [{'id': 19999, 'v': 'x'}, {'id': 0, 'v': 0, 'x': None}] does not match: "
+        "missing items: DictContains({'id': 1, 'v': IsInstance(int)}); "
+        "unexpected items: {'id': 19999, 'v': 'x'}"
+    ):
+        assert [actual[0], actual[-1]] == Unordered(expected[:2])
+
+    m = Contains([DictContains({"id": 1}), {"id": 2, "v": Any}])
+    assert [{"id": 1.0}, {"kind": 1}, 2, {"id": 2, "v": None}] == m
+    assert not m.matches([{"id": [1]}, {"id": 2, "v": None}])
+
+
+def test_contains__unsupported_values():
+    assert [5, "x"] == Contains([InInterval(0, 10)])
+    assert ["x", 5] == Unordered([InInterval(0, 10), IsInstance(str)])
+
+
+def test_unordered__set():
+    assert [1, 2] == Unordered({1, 2})
+    assert [2, 3, 1] == Contains({1, 2})
+    with raises_assertion_error("Value [1, 3] does not match: missing items: 2"):
+        assert [1, 3] == Contains({1, 2})
+
+
+def test_contains__duplicates():
+    m = Contains([1, 1, IsInstance(str)])
+
+    assert [1, "a", 2, 1] == m
+    with raises_assertion_error("Value [1, 2, 'a'] does not match: missing items: 1"):
+        assert [1, 2, "a"] == m
+
+
+def test_dict_contains__invalid_type():
+    with raises_assertion_error(
+        "Value 1 does not match: invalid type - got <class 'int'>, expected <class 'dict'>"
+    ):
+        assert 1 == DictContains({"a": 1})
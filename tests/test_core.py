@@ -1,5 +1,14 @@
+from collections import UserDict
+from dataclasses import dataclass
+from types import MappingProxyType
+import pickle
+import sys
 import pytest
-from majava.matchers import matcher, MayBe, Or, Absent, Any
+from majava import And, DictContains, InInterval, IsInstance, HasAttrs, Round, Unordered, Contains
+from majava.formats import IsJson
+from majava.fs import IsDirectory
+from majava.matchers import matcher, compile_plan, MayBe, Mismatch, Or, Absent, Any, Memoized, \
+    Shared, make_matcher
 from .common import raises_assertion_error
 
 
@@ -38,7 +47,297 @@ def test_dict_with_submatchers():
     # submatchers
     ({"a": 1}, {"a": MayBe(2)}, "Value 1 at 'a' does not match: 1 != 2"),
     ({"a": 1}, {"a": Or(2, 3, 4)}, "Value 1 at 'a' does not match: is not 2 nor 3 nor 4"),
+    # mismatching values come first, then missing and unexpected keys
+    ({"c": 1, "x": 0, "a": 2}, {"b": 1, "a": 1, "c": Any},
+     "Value 2 at 'a' does not match: 2 != 1"),
+    ({"c": 1, "x": 0}, {"b": 1, "a": 1, "c": Any},
+     "Value {'c': 1, 'x': 0} does not match: missing items with keys: 'a', 'b'"),
+    ({"z": 0, "c": 1, "a": 1, "x": 0}, {"a": 1, "c": Any, "x": Absent},
+     "Value {'z': 0, 'c': 1, 'a': 1, 'x': 0} does not match: unexpected items with keys: 'z', 'x'"),
 ])
 def test_dict_mismatch(value, expectation, reason):
     with raises_assertion_error(reason):
         assert value == matcher(expectation)
+
+
+def test_compile_plan__reusable_plan():
+    plan = compile_plan({"a": 1, "b": {"c": [1, 2]}, "d": Or(1, 2)})
+
+    assert repr(plan) == "{'a': 1, 'b': {'c': [1, 2]}, 'd': 1|2}"
+    for _ in range(3):
+        assert {"a": 1, "b": {"c": [1, 2]}, "d": 2} == plan
+    with raises_assertion_error("Value 3 at 'd' does not match: is not 1 nor 2"):
+        assert {"a": 1, "b": {"c": [1, 2]}, "d": 3} == plan
+
+
+@pytest.mark.parametrize("value, reason", [
+    ({"a": 1, "b": {"c": 3}}, "Value 3 at 'b.c' does not match: 3 != 2"),
+    ({"a": 1}, "Value {'a': 1} does not match: missing items with keys: 'b'"),
+    ({"a": 1, "b": 2}, (
+        "Value 2 at 'b' does not match: invalid type - "
+        "got <class 'int'>, expected <class 'dict'>"
+    )),
+])
+def test_compile_plan__literal_mismatch(value, reason):
+    with raises_assertion_error(reason):
+        assert value == compile_plan({"a": 1, "b": {"c": 2}})
+
+
+@pytest.mark.parametrize("nested", [MappingProxyType({"c": 2}), UserDict({"c": 2})])
+def test_compile_plan__nested_type_check(nested):
+    with raises_assertion_error(
+        f"Value {nested!r} at 'b' does not match: invalid type - "
+        f"got {type(nested)}, expected <class 'dict'>"
+    ):
+        assert {"b": nested} == matcher({"b": {"c": 2}})
+
+
+@pytest.mark.parametrize("m, good, bad", [
+    (matcher({"a": 1, "b": MayBe(2)}), {"a": 1}, {"a": 1, "b": 3}),
+    (matcher({"a": Absent}), {}, {"a": 1}),
+    (Or(1, {"a": Any}), {"a": 2}, {"b": 2}),
+    (And(IsInstance(int), InInterval(1, 3)), 2, 4),
+    (DictContains({"a": [1, Any]}), {"a": [1, 2], "b": 3}, {"a": [1]}),
+    (Unordered([1, IsInstance(str)]), ["a", 1], [1, 2]),
+    (Contains([1, 2], ordered=True), [1, 0, 2], [2, 1]),
+    (HasAttrs(real=1), 1, 2),
+    (IsJson({"a": Round(1.0)}), '{"a": 1.2}', '{"a": 1.6'),
+    (IsDirectory, ".", None),
+])
+def test_matches(m, good, bad):
+    assert m.matches(good) is True
+    assert m.matches(bad) is False
+
+
+def test_matches__no_mismatch_on_fast_path(monkeypatch):
+    created = []
+    init = Mismatch.__init__
+
+    def counting_init(self, *args):
+        created.append(args)
+        init(self, *args)
+
+    monkeypatch.setattr(Mismatch, "__init__", counting_init)
+
+    m = matcher({"a": Or(*range(100), IsInstance(str))})
+    assert {"a": "x"} == m
+    assert m.matches({"a": 100}) is False
+    assert not created
+
+    assert not ({"a": 100} == m)
+    assert len(created) == 1
+
+
+def test_shared__memoized():
+    calls = []
+
+    @make_matcher
+    def IsAddress(value):
+        calls.append(value)
+        return isinstance(value, dict) and "city" in value
+
+    address = Shared(IsAddress())
+    m = Memoized({"home": address, "work": address, "any": Or(address, {"id": int})})
+
+    home = {"city": "A"}
+    assert {"home": home, "work": home, "any": home} == m
+    assert calls == [home]
+
+    calls.clear()
+    other = {"street": "B"}
+    with raises_assertion_error("Value {'street': 'B'} at 'work' does not match: not IsAddress()"):
+        assert {"home": home, "work": other, "any": other} == m
+    # fast path evaluates each value once, the report is built again
+    assert calls == [home, other, home, other]
+
+    # memo tables are not shared between matches
+    calls.clear()
+    assert {"home": home, "work": home, "any": home} == m
+    assert calls == [home]
+
+
+def test_shared__without_scope():
+    address = Shared({"city": IsInstance(str)})
+    assert {"city": "A"} == address
+    assert [{"city": "A"}, {"city": "B"}] == [address, address]
+    with raises_assertion_error("Value 1 at 'city' does not match: not IsInstance(str)"):
+        assert {"city": 1} == address
+
+
+def test_or__indexed():
+    codes = Or(*range(200, 300), "ok", None, IsInstance(bytes))
+    assert codes._rest == (codes._plans[-1],)
+    for good in (200, 299, 250.0, "ok", None, b"x"):
+        assert good == codes
+    for bad in (300, "no", [200], {"a": 1}, float("nan")):
+        assert bad != codes
+
+    events = Or(
+        {"type": "click", "x": int, "y": int},
+        DictContains({"type": "key", "code": IsInstance(int)}),
+        {"type": "key", "alt": True},
+        {"kind": "other"},
+    )
+    assert events._dispatch[0] == "type"
+    assert len(events._rest) == 1
+    assert {"type": "key", "code": 1, "shift": True} == events
+    assert {"type": "key", "alt": True} == events
+    assert {"kind": "other"} == events
+    with raises_assertion_error(
+            "Value {'type': 'key', 'code': 'a'} does not match: is not {'type': 'click', "
+            "'x': <class 'int'>, 'y': <class 'int'>} nor DictContains({'type': 'key', "
+            "'code': IsInstance(int)}) nor {'type': 'key', 'alt': True} nor {'kind': 'other'}"):
+        assert {"type": "key", "code": "a"} == events
+    assert {"code": 1} != events
+    assert "key" != events
+
+    @dataclass
+    class Ev:
+        type: str
+        x: int
+
+    kinds = Or({"type": "a", "x": 1}, {"type": "b", "x": 2})
+    assert kinds._dispatch is not None
+    assert Ev("a", 1) == kinds
+    assert Ev("b", 2) == kinds
+    assert Ev("b", 1) != kinds
+
+
+def test_dict_contains__wide_value():
+    value = {f"k{i}": i for i in range(50_000)}
+    m = DictContains({"k1": Any, "k2": IsInstance(int), "x": MayBe(1), "y": Absent})
+    assert value == m
+    assert not m._plan._matches({**value, "y": 1})
+    with raises_assertion_error("Value 1 at 'k1' does not match: not IsInstance(str)"):
+        assert value == DictContains({"k0": 0, "k1": IsInstance(str)})
+
+
+@pytest.mark.parametrize("value, expectation, reason", [
+    ([1, 2, 3], [1, 2, 4], "Value 3 at '2' does not match: 3 != 4"),
+    ((1, 2), [1, 2], "Value (1, 2) does not match: invalid type - got <class 'tuple'>, "
+                     "expected <class 'list'>"),
+    ([1, 2], (1, 2), "Value [1, 2] does not match: invalid type - got <class 'list'>, "
+                     "expected <class 'tuple'>"),
+    ([1, 2, 3], [1, Any], "Value [1, 2, 3] does not match: invalid length - got 3, expected 2"),
+    ({"items": [{"price": 1}] * 3 + [{"price": 11}]},
+     {"items": [{"price": 1}] * 3 + [{"price": InInterval(1, 10)}]},
+     "Value 11 at 'items.3.price' does not match: not InInterval(1, 10)"),
+    ([0, 1, 2, "x", 4, 5, 6, 7], [0, 1, 2, IsInstance(int), 4, 5, 6, 8],
+     "Value 'x' at '3' does not match: not IsInstance(int)"),
+    ([0, 1, 2, 3, 4, 5, 6, 7], [0, 1, 2, IsInstance(int), 4, 5, 6, 8],
+     "Value 7 at '7' does not match: 7 != 8"),
+    ([[1, MappingProxyType({"a": 1})]], [[1, {"a": 1}]],
+     "Value mappingproxy({'a': 1}) at '0.1' does not match: invalid type - "
+     "got <class 'mappingproxy'>, expected <class 'dict'>"),
+])
+def test_sequence_mismatch(value, expectation, reason):
+    assert not compile_plan(expectation).matches(value)
+    with raises_assertion_error(reason):
+        assert value == matcher(expectation)
+
+
+def test_sequence():
+    m = matcher([1, (2, "3"), Any, [IsInstance(str), None], {"a": [1]}])
+    assert [1, (2, "3"), object(), ["x", None], {"a": [1]}] == m
+    assert [[1, [2]], ()] == matcher([[1, [2]], ()])
+    assert compile_plan([1, [2, (3,)]])._literal
+    assert not compile_plan([1, {"a": 1}])._literal
+
+
+@make_matcher
+def IsEven(value):
+    return value % 2 == 0
+
+
+@pytest.mark.parametrize("m", [
+    matcher({"a": [1, MayBe(2)], "b": Or(1, {"t": "x"})}),
+    And(IsInstance(int), InInterval(1, 3)),
+    DictContains({"a": Unordered([1, IsInstance(str)])}),
+    Contains([1, 2], ordered=True),
+    HasAttrs(real=1),
+    IsJson({"a": Round(1.0)}),
+    Memoized({"a": Shared(IsEven())}),
+])
+def test_pickle(m):
+    copy = pickle.loads(pickle.dumps(m))
+    assert repr(copy) == repr(m)
+
+
+def test_pickle__singletons():
+    for m in (Any, Absent, IsDirectory):
+        assert pickle.loads(pickle.dumps(m)) is m
+    assert pickle.loads(pickle.dumps(IsEven())) == 2
+
+    mismatch = pickle.loads(pickle.dumps(Mismatch(1, "a", lambda: "lazy")))
+    assert (mismatch.value, mismatch.path, mismatch.msg) == (1, "a", "lazy")
+
+
+def _nested(depth, leaf):
+    value = leaf
+    for i in range(depth):
+        value = {"next": value, "id": i} if i % 2 else [value]
+    return value
+
+
+def test_deep_nesting():
+    depth = sys.getrecursionlimit() * 3
+    m = compile_plan(_nested(depth, {"leaf": IsInstance(int)}))
+    assert m._deep
+    assert _nested(depth, {"leaf": 1}) == m
+    assert m.matches(_nested(depth, {"leaf": 1}))
+    assert not m.matches(_nested(depth, {"leaf": "x"}))
+
+    mismatch = m.explain(_nested(depth, {"leaf": "x"}))
+    assert mismatch.msg == "not IsInstance(int)"
+    assert mismatch.path == ".".join(["next", "0"] * (depth // 2)) + ".leaf"
+
+    literal = compile_plan(_nested(depth, 1))
+    assert not literal._literal
+    assert _nested(depth, 1) == literal
+    assert _nested(depth, 2) != literal
+
+
+@pytest.mark.parametrize("wrap", [MayBe, DictContains, matcher, And])
+def test_deep_nesting__wrappers(wrap):
+    depth = sys.getrecursionlimit() * 3
+
+    def chain(leaf, wrap=lambda v: v):
+        value = {"id": leaf}
+        for _ in range(depth):
+            value = {"id": 1, "next": wrap(value)}
+        return value
+
+    m = compile_plan(chain(IsInstance(int), wrap))
+    assert m._deep
+    assert chain(1) == m
+    assert m.matches(chain(1))
+    assert not m.matches(chain("x"))
+
+    mismatch = m.explain(chain("x"))
+    assert mismatch.msg == "not IsInstance(int)"
+    assert mismatch.path == ".".join(["next"] * depth) + ".id"
+
+
+def test_cycles():
+    expected = {"id": 1, "children": []}
+    expected["children"].append(expected)
+    plan = compile_plan(expected)
+    assert plan.plans["children"].plans[0] is plan
+
+    node = {"id": 1, "children": []}
+    node["children"].append({"id": 1, "children": [{"id": 1, "children": []}]})
+    with raises_assertion_error(
+            "Value [] at 'children.0.children.0.children' does not match: "
+            "invalid length - got 0, expected 1"):
+        assert node == plan
+
+    node = {"id": 1, "children": []}
+    node["children"].append(node)
+    assert node != plan
+    assert not plan.matches(node)
+    mismatch = plan.explain(node)
+    assert (mismatch.value, mismatch.path) == (node, "children.0")
+    assert mismatch.msg == "cyclic reference - the value is already being matched at the root"
+
+    # cyclic values terminate with finite expectations
+    assert node == matcher({"id": 1, "children": [{"id": 1, "children": [Any]}]})
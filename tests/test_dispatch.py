@@ -0,0 +1,116 @@
+from collections import namedtuple, OrderedDict, UserDict
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+import pytest
+from majava import DictContains, IsInstance, matcher, register_view
+from majava.dispatch import TypeRegistry, views
+from .common import raises_assertion_error
+
+
+@dataclass
+class Point:
+    x: int
+    y: int
+    tags: list = field(default_factory=list)
+
+
+Pair = namedtuple("Pair", "left right")
+
+
+def test_registry__mro_and_abc():
+    registry = TypeRegistry()
+    registry.register(Mapping, "mapping")
+    assert registry.dispatch(dict) == "mapping"
+    assert registry.dispatch(UserDict) == "mapping"
+    assert registry.dispatch(list) is None
+
+    @registry.register(dict)
+    def handler(value):
+        pass
+
+    assert registry.dispatch(OrderedDict) is handler
+    assert registry.dispatch(UserDict) == "mapping"
+
+    class Virtual:
+        pass
+
+    assert registry.dispatch(Virtual) is None
+    Mapping.register(Virtual)  # invalidates cached lookups
+    assert registry.dispatch(Virtual) == "mapping"
+
+
+def test_registry__kinds():
+    made = []
+    registry = TypeRegistry()
+    registry.register_kind(lambda cls: cls.__name__ == "Point",
+                           lambda cls: made.append(cls) or cls.__name__)
+
+    for _ in range(3):
+        assert registry.dispatch(Point) == "Point"
+        assert registry.dispatch(Pair) is None
+    assert made == [Point]
+
+    # types win over kinds
+    registry.register(object, "object")
+    assert registry.dispatch(Point) == "object"
+
+
+@pytest.mark.parametrize("cls, fields", [
+    (Point, ("x", "y", "tags")),
+    (Pair, ("left", "right")),
+    (dict, None),
+    (tuple, None),
+])
+def test_views__models(cls, fields):
+    view = views.dispatch(cls)
+    assert getattr(view, "fields", None) == fields
+
+
+def test_dict_expectation__model_values():
+    assert Point(1, 2) == matcher({"x": 1, "y": 2, "tags": []})
+    assert Point(1, 2) == DictContains({"x": IsInstance(int)})
+    assert Pair(1, 2) == matcher({"left": 1, "right": 2})
+    assert Pair(1, 2) == matcher((1, 2))
+    assert [Point(1, 2)] == matcher([{"x": 1, "y": 2, "tags": []}])
+
+    with raises_assertion_error("Value 3 at 'p.y' does not match: 3 != 2"):
+        assert {"p": Point(1, 3)} == matcher({"p": {"x": 1, "y": 2, "tags": []}})
+    with raises_assertion_error("Value {'x': 1, 'y': 2, 'tags': []} does not match: "
+                                "unexpected items with keys: 'tags'"):
+        assert Point(1, 2) == matcher({"x": 1, "y": 2})
+
+
+def test_dict_expectation__attrs_values():
+    attr = pytest.importorskip("attr")
+
+    @attr.s(slots=True)
+    class Item:
+        name = attr.ib()
+        price = attr.ib()
+
+    assert views.dispatch(Item).fields == ("name", "price")
+    assert Item("a", 1) == matcher({"name": "a", "price": 1})
+    assert Item("a", 1) != matcher({"name": "a", "price": 2})
+
+
+def test_register_view():
+    class Money:
+        def __init__(self, amount, currency):
+            self.amount = amount
+            self.currency = currency
+
+    m = matcher({"amount": 1, "currency": "EUR"})
+    assert not m.matches(Money(1, "EUR"))
+
+    register_view(Money, vars)
+    assert Money(1, "EUR") == m
+
+
+def test_register_view__abc(monkeypatch):
+    monkeypatch.setattr(views, "_types", {})
+    monkeypatch.setattr(views, "_cache", {})
+    register_view(Mapping, dict)
+    register_view(Sequence, list)
+
+    assert UserDict({"a": (1, 2)}) == matcher({"a": [1, 2]})
+    assert not matcher({"a": [1, 2]}).matches(UserDict({"a": "12"}))
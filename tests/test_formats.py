@@ -1,6 +1,9 @@
+import io
+import json
 import pytest
-from majava import DictContains, Any
-from majava.formats import IsJson
+from majava import DictContains, EachIs, InInterval, Or, Any
+from majava.formats import IsJson, DecodeCache, decode_cache
+from .common import raises_assertion_error
 
 
 @pytest.mark.parametrize("actual, expected", [
@@ -48,16 +51,147 @@ def test_is_json__match(actual, expected):
             "b": Any,
             "c": DictContains({"x": 1})
         },
-        (
-            "Value [1, 2, 3.14, 4.14] at 'FromJSON.a.FromJSON' does not match: "
-            "[1, 2, 3.14, 4.14] != [1, 2, <Any>, 4]'"
-        )
+        "Value 4.14 at 'FromJSON.a.FromJSON.3' does not match: 4.14 != 4"
     )
 ])
 def test_is_json__mismatch(actual, expected, reason):
-    with pytest.raises(AssertionError) as e:
+    with raises_assertion_error(reason):
         assert actual == IsJson(expected)
 
-    err_message = str(e.value)
-    reason = err_message.splitlines()[-1].strip()
-    assert reason == reason
+
+@pytest.mark.parametrize("make_input", [
+    lambda doc: doc,
+    lambda doc: doc.encode(),
+    lambda doc: io.StringIO(doc),
+    lambda doc: io.BytesIO(doc.encode()),
+])
+def test_is_json__stream_inputs(make_input):
+    doc = '{"a": 1, "b": {"c": [true, null], "d": "\\u00e9x"}, "e": [1.5, -2e3, "\\""]}'
+    m = IsJson({"a": 1, "b": DictContains({"c": [True, None]}), "e": Any}, stream=True)
+
+    assert make_input(doc) == m
+    assert make_input(doc) == IsJson(json.loads(doc), stream=True)
+
+
+def test_is_json__stream_path(tmp_path):
+    path = tmp_path / "doc.json"
+    path.write_text('{"id": 7, "items": [{"n": 1}, {"n": 2}], "blob": "' + "x" * 200_000 + '"}')
+
+    assert path == IsJson({"id": 7, "items": EachIs({"n": Any}), "blob": Any}, stream=True)
+    with raises_assertion_error(
+        "Value 3 at 'FromJSON.items.1.n' does not match: not InInterval(0, 2)"
+    ):
+        path.write_text('{"id": 7, "items": [{"n": 1}, {"n": 3}], "blob": "x"}')
+        assert path == IsJson({"id": 7, "items": EachIs({"n": InInterval(0, 2)}), "blob": Any},
+                              stream=True)
+
+
+@pytest.mark.parametrize("actual, expected, reason", [
+    ('{"a": 1, "b": 2}', {"a": 1}, (
+        "Value {'a': ..., 'b': ...} at 'FromJSON' does not match: unexpected items with keys: 'b'"
+    )),
+    ('{"b": {"x": [1, 2]}}', {"a": 1, "b": Any}, (
+        "Value {'b': ...} at 'FromJSON' does not match: missing items with keys: 'a'"
+    )),
+    ('{"a": [1, 2]}', {"a": [1, 3]}, (
+        "Value 2 at 'FromJSON.a.1' does not match: 2 != 3"
+    )),
+    ('{"a": [{"b": 1}, {"b": 2}]}', {"a": [{"b": 1}, {"b": 3}]}, (
+        "Value 2 at 'FromJSON.a.1.b' does not match: 2 != 3"
+    )),
+    ('{"a": [{"b": 1}, {"b": 2}]}', {"a": [{"b": 1}]}, (
+        "Value [...] at 'FromJSON.a' does not match: invalid length - got more than 1, expected 1"
+    )),
+    ('{"a": [{"b": 1}]}', {"a": [{"b": 1}, Any]}, (
+        "Value [...] at 'FromJSON.a' does not match: invalid length - got 1, expected 2"
+    )),
+    ('{"a": 1', {"a": 1}, (
+        "Value '{\"a\": 1' at 'FromJSON' does not match: "
+        "invalid JSON - Expecting ',' delimiter at char 7"
+    )),
+    ("", {}, "Value '' at 'FromJSON' does not match: invalid JSON - Expecting value at char 0"),
+    (None, {}, (
+        "Value None at 'FromJSON' does not match: "
+        "invalid type - expected str, bytes, file or path, not NoneType"
+    )),
+])
+def test_is_json__stream_mismatch(actual, expected, reason):
+    with raises_assertion_error(reason):
+        assert actual == IsJson(expected, stream=True)
+
+
+def test_is_json__stream_stops_at_first_mismatch():
+    # the tail is never parsed, so it may be broken
+    doc = io.StringIO('{"a": 2, "b": [' + "1, " * 100_000 + "oops")
+
+    with raises_assertion_error(
+        "Value 2 at 'FromJSON.a' does not match: 2 != 1"
+    ):
+        assert doc == IsJson({"a": 1, "b": Any}, stream=True)
+    assert doc.tell() < 100_000
+
+
+@pytest.fixture
+def cache():
+    decode_cache.clear()
+    yield decode_cache
+    decode_cache.clear()
+
+
+def test_decode_cache__shared_between_matchers(cache):
+    doc = '{"version": 2, "items": [1, 2]}'
+    m = Or(IsJson({"version": 1, "items": Any}), IsJson(DictContains({"version": 2})))
+
+    assert doc == m
+    assert doc == IsJson({"version": 2, "items": [1, 2]})
+    assert (cache.misses, cache.hits) == (1, 2)
+    assert len(cache) == 1
+    assert cache.size == len(doc)
+
+
+def test_decode_cache__errors(cache):
+    m = Or(IsJson([1]), IsJson([2]))
+    for _ in range(2):
+        with raises_assertion_error(
+            "Value '[1' does not match: is not IsJson([1]) nor IsJson([2])"
+        ):
+            assert "[1" == m
+    assert cache.misses == 1
+
+
+def test_decode_cache__bounded():
+    cache = DecodeCache(max_bytes=10, max_items=2)
+
+    assert cache.decode("json", "[1]", json.loads) == [1]
+    assert cache.decode("json", "[2]", json.loads) == [2]
+    assert cache.decode("json", "[3]", json.loads) == [3]
+    assert cache.decode("json", "[1, 2, 3, 4, 5]", json.loads) == [1, 2, 3, 4, 5]
+    assert cache.decode("json", bytearray(b"[4]"), json.loads) == [4]
+    assert (len(cache), cache.size, cache.misses) == (2, 6, 3)
+
+    cache.decode("json", "[2]", json.loads)
+    cache.decode("json", "[1]", json.loads)  # evicts [3], the least recently used
+    cache.decode("json", "[2]", json.loads)
+    cache.decode("json", "[3]", json.loads)
+    assert (len(cache), cache.hits, cache.misses) == (2, 2, 5)
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_is_json__deep(stream):
+    doc = "[" * 100_000 + "]" * 100_000
+    assert IsJson(Any, stream=stream).explain(doc) is None
+    mismatch = IsJson({"a": 1}, stream=stream).explain(doc)
+    assert mismatch.path == "FromJSON"
+    assert mismatch.msg.startswith("invalid type - got <class 'list'>")
+
+    expected = {"v": 1}
+    for _ in range(5000):
+        expected = [{"v": 1}, expected]
+    doc = '[{"v": 1},\n' * 5000 + '{"v": 1}' + "]" * 5000
+    assert doc == IsJson(expected, stream=stream)
+    assert IsJson(expected, stream=stream).matches(doc.encode())
+
+    mismatch = IsJson(expected, stream=stream).explain(doc.replace('{"v": 1}]]', '{"v": 2}]]'))
+    assert (mismatch.path, mismatch.msg) == ("FromJSON." + "1." * 5000 + "v", "2 != 1")
+    mismatch = IsJson(expected, stream=stream).explain(doc[:-1])
+    assert mismatch.msg.startswith("invalid JSON - Expecting ',' delimiter")
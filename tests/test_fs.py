@@ -0,0 +1,279 @@
+from contextlib import contextmanager
+import os
+import re
+import threading
+import time
+import pytest
+from majava import Any, Absent, MayBe, InInterval, Contains, Search, StartsWith
+from majava import fs
+from majava.fs import IsDirectory, File, DirectoryTree, FileContains, FileMatches, FileEquals, \
+    FileSize, WaitForFile, WaitForDirectory, WaitForContent
+from .common import raises_assertion_error
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "report.json").write_text("{}")
+    (tmp_path / "logs").mkdir()
+    (tmp_path / "logs" / "a.log").write_text("a" * 10)
+    (tmp_path / "logs" / "b.log").write_text("b" * 20)
+    (tmp_path / "empty").mkdir()
+    return tmp_path
+
+
+def test_is_directory(tree):
+    assert tree == IsDirectory
+    assert tree / "empty" == IsDirectory(is_empty=True)
+    assert str(tree) == IsDirectory(is_empty=False)
+    with raises_assertion_error(f"Value {tree!r} does not match: directory is not empty"):
+        assert tree == IsDirectory(is_empty=True)
+    with raises_assertion_error(f"Value {tree / 'report.json'!r} does not match: "
+                                "is not a directory"):
+        assert tree / "report.json" == IsDirectory
+
+
+def test_file(tree):
+    path = tree / "report.json"
+    os.chmod(path, 0o640)
+
+    assert repr(File(size=2, mode=0o640)) == "File(size=2, mode=0o640)"
+    assert path == File()
+    assert path == File(size=InInterval(1, 2), mode=0o640)
+    with raises_assertion_error("Value 2 at 'size' does not match: 2 != 3"):
+        assert path == File(size=3)
+    with raises_assertion_error(f"Value {path!r} does not match: mode is 0o640, expected 0o600"):
+        assert path == File(mode=0o600)
+    with raises_assertion_error(f"Value {tree!r} does not match: is not a file"):
+        assert tree == File()
+
+
+@pytest.mark.parametrize("workers", [0, 4])
+def test_directory_tree(tree, workers):
+    m = DirectoryTree({
+        "report.json": File(size=2),
+        "logs": {"*.log": File(size=InInterval(1, 20)), "core": Absent},
+        "empty": IsDirectory(is_empty=True),
+        "tmp": MayBe(IsDirectory),
+    }, stat_workers=workers)
+
+    assert tree == m
+    (tree / "logs" / "c.log").write_text("c" * 30)
+    with raises_assertion_error("Value 30 at 'logs.c.log.size' does not match: "
+                                "not InInterval(1, 20)"):
+        assert tree == m
+
+
+@pytest.mark.parametrize("workers", [0, 4])
+def test_directory_tree__matches(tree, workers, monkeypatch):
+    def failing_match(self, other):
+        raise AssertionError("_match called on the fast path")
+
+    monkeypatch.setattr(DirectoryTree, "_match", failing_match)
+    m = DirectoryTree({"report.json": File(), "logs": {"*.log": File(size=InInterval(1, 20))}},
+                      allow_unexpected=True, stat_workers=workers)
+    assert m.matches(tree)
+    assert not m.matches(tree / "report.json")
+    assert not m.matches(None)
+    (tree / "logs" / "c.log").write_text("c" * 30)
+    assert not m.matches(tree)
+    assert not DirectoryTree({"missing": Any}, allow_unexpected=True).matches(tree)
+    assert not DirectoryTree({"report.json": File()}, stat_workers=workers).matches(tree)
+
+
+def test_directory_tree__keys(tree):
+    with raises_assertion_error(f"Value {tree!r} does not match: "
+                                "missing items with keys: 'missing.txt'"):
+        assert tree == DirectoryTree({"report.json": Any, "missing.txt": Any},
+                                     allow_unexpected=True)
+    with raises_assertion_error(f"Value {str(tree / 'logs')!r} at 'logs' does not match: "
+                                "unexpected items with keys: 'b.log'"):
+        assert tree == DirectoryTree({"logs": DirectoryTree({"a.log": Any})}, allow_unexpected=True)
+    with raises_assertion_error(f"Value {tree!r} does not match: "
+                                "unexpected items with keys: 'report.json'"):
+        assert tree == DirectoryTree({"report.json": Absent}, allow_unexpected=True)
+    with raises_assertion_error(f"Value {tree!r} does not match: "
+                                "missing items with keys: '*.txt'"):
+        assert tree == DirectoryTree({"*.txt": Any}, allow_unexpected=True)
+
+
+def test_directory_tree__prunes_unmentioned(tree, monkeypatch):
+    listed = []
+    scandir = os.scandir
+
+    def tracking_scandir(path):
+        listed.append(os.fspath(path))
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", tracking_scandir)
+
+    assert tree == DirectoryTree({"report.json": File(), "logs": {"a.log": Any}},
+                                 allow_unexpected=True)
+    assert listed == []
+
+    assert tree == DirectoryTree({"*.json": File()}, allow_unexpected=True)
+    assert listed == [str(tree)]
+
+
+@pytest.fixture
+def log(tmp_path):
+    path = tmp_path / "app.log"
+    path.write_bytes(b"start\nINFO ok\nERROR disk full\nINFO ok\nERROR again\n")
+    return path
+
+
+def test_file_contains(log):
+    assert log == FileContains(b"disk full")
+    assert log == FileContains("INFO", count=2)
+    with raises_assertion_error(f"Value {log!r} does not match: does not contain 'oops'"):
+        assert log == FileContains("oops")
+    with raises_assertion_error(
+        f"Value {log!r} does not match: "
+        "contains b'ERROR' 2 time(s), first at offset 14 (line 3), expected 0"
+    ):
+        assert log == FileContains(b"ERROR", count=0)
+
+
+def test_file_matches(log):
+    assert log == FileMatches(rb"^ERROR \w+ full$", flags=re.M)
+    assert log == FileMatches(r"INFO|ERROR", count=InInterval(3, 4))
+    with raises_assertion_error(
+        f"Value {log!r} does not match: "
+        "contains a match of 'ERROR again' 1 time(s), first at offset 38 (line 5), expected 0"
+    ):
+        assert log == FileMatches("ERROR again", count=0)
+
+
+def test_file_equals(log, tmp_path):
+    content = log.read_bytes()
+    copy = tmp_path / "copy.log"
+    copy.write_bytes(content)
+
+    assert log == FileEquals(content)
+    assert log == FileEquals(copy)
+    with raises_assertion_error(
+        f"Value {log!r} does not match: differs at offset 18 (line 3)"
+    ):
+        assert log == FileEquals(content.replace(b"ROR", b"ROX"))
+    with raises_assertion_error(
+        f"Value {log!r} does not match: file is shorter than expected - ends at offset 50 (line 6)"
+    ):
+        assert log == FileEquals(content + b"tail")
+    with raises_assertion_error(
+        f"Value {log!r} does not match: file is longer than expected - extra data at offset 6 "
+        "(line 2)"
+    ):
+        assert log == FileEquals("start\n")
+
+
+def test_file_content__large_and_empty(tmp_path):
+    big = tmp_path / "big.bin"
+    with open(big, "wb") as f:
+        f.write(b"x\n" * 3_000_000)
+        f.write(b"NEEDLE")
+    empty = tmp_path / "empty"
+    empty.touch()
+
+    with raises_assertion_error(
+        f"Value {big!r} does not match: "
+        "contains b'NEEDLE' 1 time(s), first at offset 6000000 (line 3000001), expected 0"
+    ):
+        assert big == FileContains(b"NEEDLE", count=0)
+    assert empty == FileEquals(b"")
+    assert empty == FileContains(b"x", count=0)
+    assert empty == FileSize(0)
+    assert big == FileSize(InInterval(6_000_000, 7_000_000))
+    with raises_assertion_error("Value 0 at 'size' does not match: 0 != 1"):
+        assert empty == FileSize(1)
+    with raises_assertion_error():
+        assert tmp_path / "missing" == FileContains(b"x")
+
+
+@pytest.fixture(params=["inotify", "polling"])
+def wait_mode(request, monkeypatch):
+    if request.param == "inotify":
+        if fs._inotify_functions() is None:
+            pytest.skip("inotify is unavailable")
+    else:
+        monkeypatch.setattr(fs, "_inotify_functions", lambda: None)
+    return request.param
+
+
+@contextmanager
+def later(*actions, delay=0.05):
+    def run():
+        for action in actions:
+            time.sleep(delay)
+            action()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    try:
+        yield
+    finally:
+        thread.join()
+
+
+def test_wait_for_file(tmp_path, wait_mode):
+    path = tmp_path / "out.csv"
+    with later(lambda: path.write_text("a,b\n")):
+        start = time.monotonic()
+        # inotify wakes up on the change, polling backs off to at most 0.1s
+        assert path == WaitForFile(File(size=4), max_interval=0.1)
+        assert time.monotonic() - start < 1.0
+
+    with raises_assertion_error(
+            "Value 4 at 'size' does not match: 4 != 5 (still after 0.05s)"):
+        assert path == WaitForFile(File(size=5), timeout=0.05)
+    with raises_assertion_error(
+            f"Value {tmp_path / 'x'!r} does not match: is not a file ([Errno 2] No such file "
+            f"or directory: {str(tmp_path / 'x')!r}) (still after 0.05s)"):
+        assert tmp_path / "x" == WaitForFile(timeout=0.05)
+
+
+def test_wait_for_directory(tmp_path, wait_mode):
+    spool = tmp_path / "spool"
+    with later(spool.mkdir, (spool / "1.msg").touch):
+        assert spool == WaitForDirectory(IsDirectory(is_empty=False))
+    assert repr(WaitForDirectory()) == "WaitForDirectory(IsDirectory, timeout=5.0)"
+
+
+def test_wait_for_content(tmp_path, wait_mode):
+    log = tmp_path / "app.log"
+
+    def append(text):
+        return lambda: log.open("a").write(text)
+
+    with later(append("starting\n"), append("listen"), append("ing on 80\nok\n")):
+        assert log == WaitForContent(Search(r"^listening on \d+$", flags=re.M))
+    with later(append("ERROR: failed\r\n")):
+        assert log == WaitForContent(StartsWith("ERROR"), lines=True)
+    assert log == WaitForContent(Contains([b"ok\n"]), encoding=None, timeout=0)
+
+    with raises_assertion_error(
+            "Value 'starting\\nlistening on 80\\nok\\nERROR: failed\\r\\n' does not match: "
+            f"missing items: 'done' (content of {log!r} still after 0.05s)"):
+        assert log == WaitForContent(Contains(["done"]), timeout=0.05)
+    with raises_assertion_error(
+            f"Value {log!r} does not match: no line matches StartsWith('done') "
+            "(still after 0.05s, 4 line(s) read)"):
+        assert log == WaitForContent(StartsWith("done"), lines=True, timeout=0.05)
+
+
+def test_wait_for_content__reads_appended_data(tmp_path):
+    path = tmp_path / "app.log"
+    path.write_bytes(b"caf\xc3")
+    tail = fs._Tail(path, "utf-8")
+    assert tail.read() == ("caf", False)
+    with path.open("ab") as f:
+        f.write(b"\xa9\n")
+    assert tail.read() == ("\xe9\n", False)
+    assert tail.offset == 6
+    assert tail.read() == ("", False)
+
+    path.write_bytes(b"new")  # truncated
+    assert tail.read() == ("new", True)
+    path.unlink()
+    (tmp_path / "other").write_bytes(b"rotated")
+    (tmp_path / "other").rename(path)
+    assert tail.read() == ("rotated", True)
+    tail.close()
@@ -0,0 +1,21 @@
+import pytest
+from majava import DictContains, IsInstance, match_many
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_match_many(workers):
+    items = ({"id": i, "name": str(i) if i % 1000 else None} for i in range(5000))
+    m = DictContains({"name": IsInstance(str)})
+
+    failures = match_many(m, items, workers=workers, chunk_size=300)
+    assert [idx for idx, _ in failures] == [0, 1000, 2000, 3000, 4000]
+    assert str(failures[1][1]) == "Value None at 'name' does not match: not IsInstance(str)"
+
+    items = ({"id": i, "name": str(i) if i % 1000 else None} for i in range(1, 5000))
+    failures = match_many(m, items, workers=workers, chunk_size=300, first_only=True)
+    assert [idx for idx, _ in failures] == [999]
+
+
+def test_match_many__all_match():
+    assert match_many(IsInstance(int), range(100), workers=2, chunk_size=7) == []
+    assert match_many({"a": 1}, [], workers=2) == []
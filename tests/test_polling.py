@@ -0,0 +1,83 @@
+from majava import Eventually, InInterval, And, MayBe, IsInstance, matcher
+from majava.polling import Backoff
+from .common import raises_assertion_error
+import asyncio
+import itertools
+import pytest
+import time
+
+
+def test_backoff():
+    backoff = Backoff(10, interval=0.1, max_interval=0.3, factor=2)
+    assert [backoff.next_delay() for _ in range(3)] == [0.1, 0.2, 0.3]
+    assert backoff.next_delay(progress=True) == 0.1
+
+    assert Backoff(0).next_delay() is None
+
+
+def test_eventually():
+    counter = itertools.count()
+    assert (lambda: next(counter)) == Eventually(3, timeout=5, interval=0.001)
+    assert next(counter) == 4
+
+    start = time.monotonic()
+    with raises_assertion_error() as rc:
+        assert (lambda: {"a": 1}) == Eventually({"a": 2}, timeout=0.05, interval=0.02)
+    assert rc.match(r"Value 1 at 'a' does not match: 1 != 2 "
+                    r"\(still after \d attempt\(s\) in 0.05s\)$")
+    assert time.monotonic() - start < 1
+
+    with raises_assertion_error("Value 1 does not match: invalid type - expected a callable, "
+                                "coroutine function or async iterator, not <class 'int'>"):
+        assert 1 == Eventually(1)
+
+
+def test_eventually__async():
+    state = {"n": 0}
+
+    async def fetch():
+        state["n"] += 1
+        return state["n"]
+
+    async def stream():
+        for i in range(3):
+            yield i
+
+    assert fetch == Eventually(InInterval(3, 5), interval=0.001)
+
+    async def main():
+        return await asyncio.gather(
+            Eventually(InInterval(10, 20), interval=0.001).wait_async(fetch),
+            Eventually(2).wait_async(stream()),
+        )
+
+    value, item = asyncio.run(main())
+    assert 10 <= value <= 20 and item == 2
+
+    with pytest.raises(AssertionError, match=r"^Value 2 does not match: 2 != 5 "
+                                             r"\(iterator exhausted after 3 item\(s\)\)$"):
+        Eventually(5).wait(stream())
+
+    async def in_loop():
+        return Eventually(1).explain(fetch)
+
+    assert str(asyncio.run(in_loop())).endswith(
+        "does not match: asynchronous source in a running event loop - "
+        "use `await Eventually(...).wait_async(source)`")
+
+
+@pytest.mark.parametrize("wrap", [
+    (lambda m: And(m), lambda s: s),
+    (matcher, lambda s: s),
+    (lambda m: matcher({"a": m}), lambda s: {"a": s}),
+    (lambda m: matcher([m]), lambda s: [s]),
+    (lambda m: MayBe(m) & IsInstance(object), lambda s: s),
+], ids=["and", "matcher", "dict", "list", "nested"])
+def test_eventually__nested(wrap):
+    expected, value = wrap[0](Eventually(2, timeout=0.3, interval=0.05)), wrap[1](lambda: 1)
+
+    start = time.monotonic()
+    with raises_assertion_error():
+        assert value == expected
+    # polled once, not once more to explain the failure
+    assert time.monotonic() - start < 0.55
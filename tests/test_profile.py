@@ -0,0 +1,62 @@
+from majava import Matcher, Unordered, InInterval, matcher
+from majava.matchers import make_matcher
+from majava.profile import Profiler
+import json
+
+pytest_plugins = "pytester"
+
+
+def _stats(report, name):
+    return next(i for i in report["types"] if i["type"].endswith(name))
+
+
+def test_profiler():
+    profiler = Profiler()
+    profiler.install()
+    try:
+        @make_matcher
+        def IsEven(value):
+            return value % 2 == 0
+
+        m = matcher({"a": Unordered([1, 2]), "b": IsEven()})
+        assert {"a": [2, 1], "b": 4} == m
+        assert {"a": [2, 1], "b": 3} != m
+        assert 5 == InInterval(1, 10)
+    finally:
+        profiler.uninstall()
+
+    report = profiler.report()
+    assert _stats(report, "Unordered")["calls"] == 3  # `_matches` and then `_match` on failure
+    assert _stats(report, "IsEven")["calls"] == 3
+    wrap = _stats(report, "_MatcherWrap")
+    assert wrap["cumulative"] >= _stats(report, "_DictPlan")["cumulative"]
+    assert wrap["self"] <= wrap["cumulative"]
+
+    # one site per assert, the failed comparison builds a report too
+    assert sorted(i["calls"] for i in report["sites"] if i["file"] == __file__) == [1, 1, 2]
+
+    # uninstalled, so no more records
+    assert 5 == InInterval(1, 10)
+    assert profiler.report() == report
+    assert not hasattr(Matcher.__dict__["_matches"], "__majava_profiled__")
+
+
+def test_profile_option(pytester, tmp_path):
+    pytester.makepyfile("""
+        from majava import Unordered
+
+        def test_it():
+            for _ in range(3):
+                assert [3, 2, 1] == Unordered([1, 2, 3])
+    """)
+    out = tmp_path / "profile.json"
+    result = pytester.runpytest("--majava-profile", f"--majava-profile-json={out}")
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(["*majava profile*", "*3 * majava.basic.Unordered"])
+
+    report = json.loads(out.read_text())
+    assert report["sites"] == [{
+        "test": "test_profile_option.py::test_it", "file": report["sites"][0]["file"], "line": 5,
+        "calls": 3, "cumulative": report["sites"][0]["cumulative"],
+        "self": report["sites"][0]["self"],
+    }]
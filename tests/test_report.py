@@ -0,0 +1,117 @@
+from collections import OrderedDict, defaultdict, namedtuple
+from dataclasses import dataclass, field
+from majava import matcher, EachIs, InInterval, Any, Unordered
+from majava.matchers import Mismatch
+from majava.pytplug import pytest_assertrepr_compare
+from majava.report import short_repr, structural_diff
+from .common import raises_assertion_error
+import pytest
+
+
+@pytest.mark.parametrize("value", [
+    1, "str", b"bytes", [1, (2,)], {"b": 1, "a": {"c": None}}, {3, 1}, frozenset(), 1.5,
+])
+def test_short_repr__small(value):
+    assert short_repr(value) == repr(value)
+
+
+def test_short_repr__big():
+    value = {"items": list(range(10**6)), "text": "x" * 10**6, "data": b"y" * 10**6}
+    s = short_repr(value)
+    assert len(s) < 5000
+    assert s.startswith("{'items': [0, 1, 2,")
+    assert "..." in s
+
+
+Point = namedtuple("Point", "x y")
+
+
+@dataclass
+class Batch:
+    items: list
+    secret: str = field(default="", repr=False)
+
+
+@pytest.mark.parametrize("value, expected", [
+    (Point(1, [2]), "Point(x=1, y=[2])"),
+    (Batch([1]), "Batch(items=[1])"),
+    (OrderedDict(a=1), "OrderedDict({'a': 1})"),
+    (defaultdict(list, a=[1]), "defaultdict(<class 'list'>, {'a': [1]})"),
+])
+def test_short_repr__composite(value, expected):
+    assert short_repr(value) == expected
+
+
+def test_short_repr__big_composite():
+    big = list(range(1_000_000))
+    for value in (OrderedDict(a=big), defaultdict(list, a=big), Point(big, 1), Batch(big)):
+        assert len(short_repr(value, max_items=4)) < 100
+
+
+def test_mismatch__big_value():
+    value = list(range(10**5))
+    e = Unordered(list(range(1, 10**5 + 1))).explain(value)
+    assert isinstance(e, Mismatch)
+    assert len(str(e)) < 10000
+    assert str(e).endswith("missing items: 100000; unexpected items: 0")
+
+    with raises_assertion_error():
+        assert value == Unordered(list(range(1, 10**5 + 1)))
+
+
+def test_structural_diff():
+    value = {"a": 1, "items": [{"price": i, "name": "x"} for i in range(10)], "z": 2, "big": [0]}
+    m = matcher({"a": 1, "items": EachIs({"price": InInterval(0, 5), "name": Any}), "z": 2,
+                 "big": Any})
+    assert structural_diff(value, m.explain(value)) == [
+        "{",
+        "    'a': 1,",
+        "    'items': [",
+        "        ... 5 item(s)",
+        "        {'price': 5, 'name': 'x'},",
+        "        {",
+        "            'price': 6,  <- not InInterval(0, 5)",
+        "            'name': 'x',",
+        "        },",
+        "        {'price': 7, 'name': 'x'},",
+        "        ... 2 item(s)",
+        "    ],",
+        "    'z': 2,",
+        "    ... 1 item(s)",
+        "}",
+    ]
+
+
+def test_structural_diff__unresolved_path():
+    assert structural_diff({"a": "{}"}, Mismatch({}, "a.FromJSON", "missing items")) == [
+        "{",
+        "    'a': '{}',  <- at 'FromJSON': missing items",
+        "}",
+    ]
+
+
+class _Config:
+    def __init__(self, verbose):
+        self.verbose = verbose
+
+    def getoption(self, name):
+        return self.verbose
+
+
+def test_assertrepr_compare():
+    value = {"a": [1, 2]}
+    m = matcher({"a": [1, 3]})
+    reason = "Value 2 at 'a.1' does not match: 2 != 3"
+
+    assert pytest_assertrepr_compare(_Config(0), "==", value, m) == [
+        "{'a': [1, 2]} == {'a': [1, 3]}", reason]
+    assert pytest_assertrepr_compare(_Config(2), "==", value, m) == [
+        "{'a': [1, 2]} == {'a': [1, 3]}",
+        "{",
+        "    'a': [",
+        "        1,",
+        "        2,  <- 2 != 3",
+        "    ],",
+        "}",
+        reason,
+    ]
@@ -0,0 +1,110 @@
+from majava import Any, MayBe, Round, matcher
+from majava.snapshot import SnapshotStore, dump, load, main
+from .common import raises_assertion_error
+import pytest
+
+pytest_plugins = "pytester"
+
+
+def test_dump_load():
+    value = {"b": [1, -2.5, None], "a": ("x", b"y"), "c": {3, 1}, 4: True}
+    assert dump(value) == "{'b': [1, -2.5, None], 'a': ('x', b'y'), 'c': {1, 3}, 4: True}"
+    assert load(dump(value)) == value
+
+    expected = load("{'id': Any, 'price': Round(9.99, 2), 'note': MayBe(IsInstance(str))}")
+    assert isinstance(expected["note"], MayBe) and isinstance(expected["price"], Round)
+    assert expected["id"] is Any
+    assert {"id": 7, "price": 9.991} == matcher(expected)
+    assert {"id": 7, "price": 9.991, "note": "x"} == matcher(expected)
+    with raises_assertion_error("Value 1 at 'note' does not match: not IsInstance(str)"):
+        assert {"id": 7, "price": 9.991, "note": 1} == matcher(expected)
+
+    with pytest.raises(TypeError, match="values of type object can't be snapshotted"):
+        dump({"a": object()})
+    with pytest.raises(ValueError, match="unsupported expression in snapshot at line 1: "
+                                         r"__import__\('os'\)"):
+        load("{'a': __import__('os')}")
+
+
+def test_store(tmp_path, capsys):
+    store = SnapshotStore(tmp_path / "snapshots.db")
+    assert store.entries("t1") == {}
+    assert not (tmp_path / "snapshots.db").exists()
+
+    h = store.put("t1", "0", "[1, 2]")
+    assert store.put("t2", "x", "[1, 2]") == h
+    store.close()
+
+    store = SnapshotStore(tmp_path / "snapshots.db")
+    assert store.entries("t1") == {"0": h}
+    assert store.text(h) == "[1, 2]"
+    assert [i[:3] for i in store.list()] == [("t1", "0", h), ("t2", "x", h)]
+    store.close()
+
+    db = str(tmp_path / "snapshots.db")
+    assert main(["-d", db, "show", "t2", "x"]) == 0
+    assert main(["-d", db, "list", "t1"]) == 0
+    assert main(["-d", db, "show", "t3", "x"]) == 1
+    assert capsys.readouterr().out == f"[1, 2]\nt1  0  {h[:12]}  14\n"
+
+
+_TEST_FILE = """
+    from majava import Snapshot
+
+    VALUE = {VALUE}
+
+    def test_it():
+        assert {{"id": 1, "items": VALUE}} == Snapshot()
+        assert "text" == Snapshot("named")
+"""
+
+
+def test_snapshot_plugin(pytester):
+    pytester.makepyfile(_TEST_FILE.format(VALUE=[1, 2]))
+    pytester.runpytest().assert_outcomes(passed=1)  # recorded
+    pytester.runpytest().assert_outcomes(passed=1)
+
+    pytester.makepyfile(_TEST_FILE.format(VALUE=[1, 3]))
+    result = pytester.runpytest()
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(
+        ["*Value 3 at 'items.1' does not match: 3 != 2"])
+
+    pytester.runpytest("--majava-update-snapshots").assert_outcomes(passed=1)
+    pytester.runpytest().assert_outcomes(passed=1)
+
+    # edited snapshot with a matcher survives updates of matching values
+    store = SnapshotStore(pytester.path / ".majava-snapshots.db")
+    store.put("test_snapshot_plugin.py::test_it", "0", "{'id': 1, 'items': Any}")
+    store.close()
+    pytester.makepyfile(_TEST_FILE.format(VALUE=[4]))
+    pytester.runpytest("--majava-update-snapshots").assert_outcomes(passed=1)
+
+    store = SnapshotStore(pytester.path / ".majava-snapshots.db")
+    entries = store.entries("test_snapshot_plugin.py::test_it")
+    assert store.text(entries["0"]) == "{'id': 1, 'items': Any}"
+    assert store.text(entries["named"]) == "'text'"
+    assert len(store.list()) == 2
+    store.close()
+
+
+def test_snapshot__outside_of_test():
+    from majava import snapshot
+    session, snapshot.session = snapshot.session, None
+    try:
+        with pytest.raises(RuntimeError):
+            snapshot.Snapshot()
+    finally:
+        snapshot.session = session
+
+
+def test_snapshot__invalid_type(pytester):
+    pytester.makepyfile("""
+        from majava import Snapshot
+
+        def test_it():
+            assert object() == Snapshot()
+    """)
+    result = pytester.runpytest()
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(["*does not match: values of type object can't be snapshotted"])
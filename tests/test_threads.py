@@ -0,0 +1,60 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from majava import DictContains, IsInstance, Or, Unordered, matcher
+from majava.fs import IsDirectory
+from majava.matchers import last_mismatch
+from majava.pytplug import pytest_assertrepr_compare
+
+
+SCHEMA = matcher({"id": IsInstance(int), "kind": Or("a", "b"), "tags": Unordered([1, 2])})
+
+
+def check(idx):
+    good = {"id": idx, "kind": "ab"[idx % 2], "tags": [2, 1]}
+    bad = {"id": idx, "kind": "c", "tags": [1, 2]}
+    if idx % 3:
+        bad = {"id": str(idx), "kind": "a", "tags": [1, 2]}
+
+    assert good == SCHEMA
+    assert not (bad == SCHEMA)
+    return str(last_mismatch(SCHEMA, bad))
+
+
+@pytest.mark.parametrize("workers", [2, 8, 32])
+def test_shared_matcher__concurrent(workers):
+    with ThreadPoolExecutor(workers) as pool:
+        results = list(pool.map(check, range(2000)))
+
+    for idx, reason in enumerate(results):
+        if idx % 3:
+            assert reason == f"Value {str(idx)!r} at 'id' does not match: not IsInstance(int)"
+        else:
+            assert reason == "Value 'c' at 'kind' does not match: is not 'a' nor 'b'"
+
+
+def test_assertrepr__concurrent(tmp_path):
+    (tmp_path / "file").touch()
+    not_empty = IsDirectory(is_empty=True)
+    m = DictContains({"n": IsInstance(int)})
+
+    def compare(idx):
+        value = {"n": str(idx)} if idx % 2 else tmp_path
+        right = m if idx % 2 else not_empty
+        assert not (value == right)
+        return pytest_assertrepr_compare(None, "==", value, right)[-1]
+
+    with ThreadPoolExecutor(16) as pool:
+        reports = list(pool.map(compare, range(1000)))
+
+    for idx, report in enumerate(reports):
+        if idx % 2:
+            assert report == f"Value {str(idx)!r} at 'n' does not match: not IsInstance(int)"
+        else:
+            assert report == f"Value {tmp_path!r} does not match: directory is not empty"
+
+
+def test_last_mismatch__other_value():
+    assert not ({"id": "x", "kind": "a", "tags": [1, 2]} == SCHEMA)
+    reason = str(last_mismatch(SCHEMA, {"id": 1, "kind": "z", "tags": [1, 2]}))
+    assert reason == "Value 'z' at 'kind' does not match: is not 'a' nor 'b'"
+    assert last_mismatch(SCHEMA, {"id": 1, "kind": "a", "tags": [1, 2]}) is None